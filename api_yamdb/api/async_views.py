@@ -0,0 +1,58 @@
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import Http404
+from rest_framework.permissions import SAFE_METHODS
+
+from .views import CommentViewSet, ReviewViewSet, TitleViewSet
+
+
+def rendered(view):
+    """Выполняет DRF-представление и сразу рендерит ответ, чтобы весь
+    синхронный код, включая сериализацию, отработал в одном потоке."""
+
+    def wrapper(request, *args, **kwargs):
+        try:
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+            return response
+        finally:
+            close_old_connections()
+
+    return wrapper
+
+
+def async_view(viewset, actions):
+    """Асинхронная обёртка над вьюсетом для ASGI.
+
+    Django 3.2 не умеет асинхронный ORM, поэтому чтение выполняется тем же
+    вьюсетом (с теми же правами и ответами), но в общем пуле потоков,
+    а не в единственном потоке, через который ASGI пропускает
+    синхронные представления. Запись остаётся в этом потоке."""
+    view = rendered(viewset.as_view(actions))
+    read = sync_to_async(view, thread_sensitive=False)
+    write = sync_to_async(view)
+
+    async def handler(request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            return await read(request, *args, **kwargs)
+        return await write(request, *args, **kwargs)
+
+    handler.csrf_exempt = True
+    return handler
+
+
+async def wsgi_only(request, *args, **kwargs):
+    """Закрывает под ASGI потоковую выгрузку: Django 3.2 читает
+    StreamingHttpResponse прямо в цикле событий, где запросы к БД
+    запрещены, и ответ обрывался бы после заголовков."""
+    raise Http404
+
+
+title_list = async_view(TitleViewSet, {'get': 'list', 'post': 'create'})
+title_detail = async_view(TitleViewSet, {
+    'get': 'retrieve', 'put': 'update', 'patch': 'partial_update',
+    'delete': 'destroy',
+})
+review_list = async_view(ReviewViewSet, {'get': 'list', 'post': 'create'})
+comment_list = async_view(CommentViewSet, {'get': 'list', 'post': 'create'})
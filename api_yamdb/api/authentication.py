@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+DEFAULT_USER_CACHE_TIMEOUT = 60
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def get_user_cache():
+    """Кэш пользователей или None, если USER_CACHE_ALIAS не задан.
+    Кэш должен быть общим для всех процессов: сигналы сбрасывают запись
+    только в своём процессе, и в кэше в памяти другого воркера
+    заблокированный пользователь оставался бы до истечения записи."""
+    alias = getattr(settings, 'USER_CACHE_ALIAS', None)
+    if alias is None:
+        return None
+    cache = caches[alias]
+    if isinstance(cache, LocMemCache):
+        raise ImproperlyConfigured(
+            f'USER_CACHE_ALIAS "{alias}" must point to a cache shared '
+            'by all processes, not LocMemCache')
+    return cache
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWT-аутентификация, берущая пользователя из общего кэша с коротким
+    временем жизни вместо запроса к БД на каждый запрос.
+    Запись сбрасывается сигналами при сохранении или удалении User.
+    Без USER_CACHE_ALIAS пользователь читается из БД."""
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        cache = get_user_cache()
+        if user_id is None or cache is None:
+            return super().get_user(validated_token)
+
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            cache.set(key, user, getattr(settings, 'USER_CACHE_TIMEOUT',
+                                         DEFAULT_USER_CACHE_TIMEOUT))
+        return user
@@ -0,0 +1,227 @@
+import hashlib
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.utils.module_loading import import_string
+
+from .models import ALL_COLLECTIONS, CollectionVersion
+from .replicas import current_replica
+from .timing import stage
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_TIMEOUT = 60
+
+
+class LRUCacheBackend:
+    """Кэш в памяти процесса, вытесняющий давно не использованные записи
+    при превышении max_bytes."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, size, expires = entry
+            if expires is not None and expires < time.monotonic():
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None, size=0):
+        size += len(key)
+        if size > self.max_bytes:
+            return
+        expires = time.monotonic() + timeout if timeout else None
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = (value, size, expires)
+            self.size += size
+            while self.size > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        return {'entries': len(self._entries), 'bytes': self.size,
+                'max_bytes': self.max_bytes}
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+
+class DjangoCacheBackend:
+    """Кэш-сервер из settings.CACHES (например, memcached), общий для
+    всех процессов приложения."""
+
+    def __init__(self, alias='default'):
+        self.cache = caches[alias]
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value, timeout=None, size=0):
+        self.cache.set(key, value, timeout)
+
+    def clear(self):
+        self.cache.clear()
+
+    def stats(self):
+        return {}
+
+
+class ResponseCache:
+    """Кэш отрендеренных ответов, разбитый на пространства имён.
+
+    В ключ входит ETag, построенный по версиям коллекций из БД
+    (collection_validators). Изменение в любом процессе поднимает версию,
+    старые записи просто перестают запрашиваться и вытесняются сами."""
+
+    key_prefix = 'response'
+
+    def __init__(self, backend, timeout=DEFAULT_TIMEOUT):
+        self.backend = backend
+        self.timeout = timeout
+        self.counters = Counter()
+
+    @classmethod
+    def from_settings(cls):
+        config = getattr(settings, 'RESPONSE_CACHE', {})
+        backend = import_string(
+            config.get('BACKEND', 'api.cache.LRUCacheBackend'))
+        return cls(backend(**config.get('OPTIONS', {})),
+                   config.get('TIMEOUT', DEFAULT_TIMEOUT))
+
+    def make_key(self, namespace, request, etag):
+        # URL хэшируется: ключи memcached ограничены по длине и символам.
+        url = hashlib.md5(
+            f'{request.accepted_media_type}:{request.build_absolute_uri()}'
+            .encode()).hexdigest()
+        version = etag.strip('"')
+        return f'{self.key_prefix}:{namespace}:{version}:{url}'
+
+    def get(self, key):
+        entry = self.backend.get(key)
+        self.counters['hits' if entry is not None else 'misses'] += 1
+        return entry
+
+    def set(self, key, content, content_type):
+        self.backend.set(key, (content, content_type), self.timeout,
+                         size=len(content))
+
+    def stats(self):
+        return {**self.counters, **self.backend.stats()}
+
+
+response_cache = ResponseCache.from_settings()
+
+
+def mark_changed(*namespaces):
+    """Сбрасывает кэш ответов и ETag для изменившихся коллекций: версии
+    в БД общие для всех процессов, и от них зависят оба."""
+    CollectionVersion.objects.bump(*namespaces)
+
+
+def collection_validators(namespace, media_type, using=None):
+    """Возвращает ETag и время последнего изменения коллекции,
+    не строя сам ответ: один запрос к таблице версий.
+    Версию коллекции должна поднимать каждая модель, чьи поля попадают
+    в её ответы (см. api/signals.py), а не только модель самой коллекции."""
+    versions = dict.fromkeys((ALL_COLLECTIONS, namespace), 0)
+    last_modified = None
+    queryset = CollectionVersion.objects.filter(name__in=versions)
+    if using is not None:
+        queryset = queryset.using(using)
+    for name, version, modified in queryset.values_list(
+            'name', 'version', 'modified'):
+        versions[name] = version
+        last_modified = max(last_modified or modified, modified)
+    etag = hashlib.md5(
+        f'{namespace}:{versions[ALL_COLLECTIONS]}.{versions[namespace]}:'
+        f'{media_type}'.encode()).hexdigest()
+    return f'"{etag}"', last_modified and int(last_modified.timestamp())
+
+
+class CachedReadMixin:
+    """Отдаёт list и retrieve из кэша ответов (для анонимных
+    пользователей) и отвечает 304 на условные запросы.
+    Вьюсет задаёт пространство имён, которое сбрасывают сигналы моделей."""
+
+    cache_namespace = None
+
+    def get_cache_namespace(self):
+        return self.cache_namespace
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request,
+                                    *args, **kwargs)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        etag, last_modified = collection_validators(
+            self.get_cache_namespace(), request.accepted_media_type)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            # Отставшая реплика отдаёт данные старее версии коллекции:
+            # такой ответ не кэшируется и не получает ETag основной БД,
+            # иначе кэш и клиенты закрепили бы устаревшее тело.
+            replica = current_replica()
+            fresh = replica is None or collection_validators(
+                self.get_cache_namespace(), request.accepted_media_type,
+                using=replica)[0] == etag
+            response = self.build_response(
+                handler, request, etag if fresh else None, *args, **kwargs)
+            if not fresh:
+                return response
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def build_response(self, handler, request, etag, *args, **kwargs):
+        # Без etag (реплика отстала) ответ не берётся из кэша и не
+        # кладётся в него.
+        if request.user.is_authenticated or etag is None:
+            return handler(request, *args, **kwargs)
+
+        key = response_cache.make_key(self.get_cache_namespace(), request,
+                                      etag)
+        entry = response_cache.get(key)
+        if entry is not None:
+            content, content_type = entry
+            response = HttpResponse(content, content_type=content_type)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            response.accepted_renderer = request.accepted_renderer
+            response.accepted_media_type = request.accepted_media_type
+            response.renderer_context = self.get_renderer_context()
+            with stage('render'):
+                response.render()
+            response_cache.set(key, response.content,
+                               response['Content-Type'])
+        response['X-Cache'] = 'MISS'
+        return response
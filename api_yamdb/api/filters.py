@@ -1,12 +1,46 @@
-from django_filters.rest_framework import FilterSet, CharFilter
+from django.db.models import Count
+from django_filters.rest_framework import (BaseInFilter, CharFilter,
+                                           ChoiceFilter, FilterSet,
+                                           NumberFilter)
 
 from reviews.models import Title
 
+GENRE_MATCH_ANY = 'any'
+GENRE_MATCH_ALL = 'all'
+GENRE_MATCHES = (
+    (GENRE_MATCH_ANY, 'Хотя бы один из жанров'),
+    (GENRE_MATCH_ALL, 'Все жанры'),
+)
+
+
+class CharInFilter(BaseInFilter, CharFilter):
+    """Список значений через запятую."""
+
 
 class TitleFilter(FilterSet):
-    genre = CharFilter(field_name='genre__slug', lookup_expr='contains')
-    category = CharFilter(field_name='category__slug', lookup_expr='contains')
+    """Точные фильтры по slug жанров и категорий (через запятую) и по
+    диапазону лет. Жанры проверяются подзапросом к таблице связей по её
+    индексу, поэтому произведения в выдаче не повторяются."""
+
+    genre = CharInFilter(method='filter_genre')
+    genre_match = ChoiceFilter(choices=GENRE_MATCHES, method='filter_nothing')
+    category = CharInFilter(field_name='category__slug', lookup_expr='in')
+    year_min = NumberFilter(field_name='year', lookup_expr='gte')
+    year_max = NumberFilter(field_name='year', lookup_expr='lte')
 
     class Meta:
         model = Title
         fields = ('genre', 'year', 'name', 'category')
+
+    def filter_genre(self, queryset, name, value):
+        slugs = set(value)
+        titles = Title.genre.through.objects.filter(
+            genre__slug__in=slugs).values('title_id')
+        if self.form.cleaned_data.get('genre_match') == GENRE_MATCH_ALL:
+            titles = titles.annotate(genres=Count('genre_id')).filter(
+                genres=len(slugs)).values('title_id')
+        return queryset.filter(pk__in=titles)
+
+    def filter_nothing(self, queryset, name, value):
+        # Значение читает filter_genre.
+        return queryset
@@ -0,0 +1,27 @@
+# Generated by Django 3.2 on 2026-10-17 20:43
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CollectionVersion',
+            fields=[
+                ('name', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='name')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='version')),
+                ('modified', models.DateTimeField(default=django.utils.timezone.now, verbose_name='modified')),
+            ],
+            options={
+                'verbose_name': 'версия коллекции',
+                'verbose_name_plural': 'версии коллекций',
+            },
+        ),
+    ]
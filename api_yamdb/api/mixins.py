@@ -1,6 +1,13 @@
+from django.conf import settings
 from rest_framework import mixins, viewsets, filters
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.response import Response
 
 from .permissions import IsAdmin, ReadOnly
+from .timing import stage
+from .utils import requested_fields
+
+DEFAULT_BATCH_MAX_IDS = 100
 
 
 class CreateListDestroyMixin(mixins.CreateModelMixin, mixins.ListModelMixin,
@@ -15,3 +22,72 @@ class CreateListDestroyMixin(mixins.CreateModelMixin, mixins.ListModelMixin,
     filter_backends = (filters.SearchFilter,)
     search_fields = ('slug', 'name')
     lookup_field = 'slug'
+
+
+class FastListMixin:
+    """list отдаёт строки values(), собранные fast_serializer_class,
+    вместо объектов моделей, пропущенных через serializer_class.
+    Учитывает ?fields= и ?expand=."""
+
+    fast_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.fast_serializer_class(*requested_fields(request))
+        rows = serializer.rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        with stage('serialize'):
+            data = serializer.serialize(rows if page is None else page)
+        if page is None:
+            return Response(data)
+        return self.get_paginated_response(data)
+
+    def retrieve_queryset(self, queryset):
+        """Для retrieve с ?fields= или ?expand= читает только столбцы,
+        которые для этих полей выбрал бы fast_serializer_class, и
+        присоединяет только нужные для них связанные модели. Внешние
+        ключи читаются всегда: по ним проверяются права на объект."""
+        fields, expand = requested_fields(self.request)
+        if self.action != 'retrieve' or (fields is None and not expand):
+            return queryset
+        values = self.fast_serializer_class(fields, expand).values
+        model = queryset.model
+        related = {column.split('__')[0] for column in values
+                   if '__' in column}
+        queryset = queryset.select_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*values, *(
+            field.attname for field in model._meta.concrete_fields
+            if field.is_relation))
+
+
+class BatchIdsMixin:
+    """list с ?ids=1,5,9 отдаёт объекты в порядке id из запроса одним
+    запросом к БД, без пагинации и COUNT. На месте ненайденных id стоит
+    {"id": ..., "detail": ...}. Число id ограничено BATCH_MAX_IDS.
+    Ставится перед FastListMixin."""
+
+    def list(self, request, *args, **kwargs):
+        if 'ids' not in request.query_params:
+            return super().list(request, *args, **kwargs)
+        ids = self.get_batch_ids(request.query_params['ids'])
+        serializer = self.fast_serializer_class(*requested_fields(request))
+        rows = list(serializer.rows(
+            self.filter_queryset(self.get_queryset()).filter(pk__in=ids)))
+        with stage('serialize'):
+            found = dict(zip((row['id'] for row in rows),
+                             serializer.serialize(rows)))
+        return Response([
+            found.get(pk, {'id': pk, 'detail': NotFound.default_detail})
+            for pk in ids
+        ])
+
+    def get_batch_ids(self, value):
+        max_ids = getattr(settings, 'BATCH_MAX_IDS', DEFAULT_BATCH_MAX_IDS)
+        ids = [pk.strip() for pk in value.split(',') if pk.strip()]
+        # isdigit() пропускает и не-ASCII цифры, которые не берёт int().
+        if not ids or not all(pk.isascii() and pk.isdigit() for pk in ids):
+            raise ValidationError({'ids': 'Ожидаются id через запятую.'})
+        if len(ids) > max_ids:
+            raise ValidationError({'ids': f'Не больше {max_ids} id.'})
+        return [int(pk) for pk in ids]
@@ -0,0 +1,43 @@
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.utils import timezone
+
+# Версия, которую меняют массовые операции в обход сигналов моделей.
+ALL_COLLECTIONS = 'all'
+
+
+class CollectionVersionQuerySet(models.QuerySet):
+    def bump(self, *names):
+        """Увеличивает версии коллекций, создавая недостающие."""
+        now = timezone.now()
+        for name in names:
+            if self.filter(name=name).update(version=F('version') + 1,
+                                             modified=now):
+                continue
+            try:
+                with transaction.atomic():
+                    self.create(name=name, version=1, modified=now)
+            except IntegrityError:
+                self.filter(name=name).update(version=F('version') + 1,
+                                              modified=now)
+
+
+class CollectionVersion(models.Model):
+    """Счётчик изменений коллекции объектов API (списка произведений,
+    отзывов к произведению и т. п.) для условных GET-запросов."""
+
+    name = models.CharField(max_length=64, primary_key=True,
+                            verbose_name='name')
+    version = models.PositiveBigIntegerField(default=0,
+                                             verbose_name='version')
+    modified = models.DateTimeField(default=timezone.now,
+                                    verbose_name='modified')
+
+    objects = CollectionVersionQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'версия коллекции'
+        verbose_name_plural = 'версии коллекций'
+
+    def __str__(self):
+        return f'{self.name}@{self.version}'
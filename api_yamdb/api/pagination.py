@@ -0,0 +1,33 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class PubDateCursorPagination(CursorPagination):
+    """Курсорная пагинация по (pub_date, id), совпадающая с сортировкой
+    моделей. Без COUNT(*) и OFFSET: глубокие страницы не дороже первой."""
+
+    ordering = ('-pub_date', '-id')
+
+
+class OptionalCursorPagination(PageNumberPagination):
+    """Постраничная пагинация, которую клиент может сменить на курсорную
+    параметром ?pagination=cursor (или передав готовый курсор)."""
+
+    cursor_pagination_class = PubDateCursorPagination
+    mode_query_param = 'pagination'
+    cursor = None
+
+    def use_cursor(self, request):
+        return (request.query_params.get(self.mode_query_param) == 'cursor'
+                or self.cursor_pagination_class.cursor_query_param
+                in request.query_params)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_cursor(request):
+            self.cursor = self.cursor_pagination_class()
+            return self.cursor.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor is not None:
+            return self.cursor.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -31,7 +31,7 @@ class IsAuthor(BasePermission):
         return request.user.is_authenticated
 
     def has_object_permission(self, request, view, obj):
-        return obj.author == request.user
+        return obj.author_id == request.user.pk
 
 
 class IsSuperuser(BasePermission):
@@ -0,0 +1,132 @@
+import itertools
+import threading
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+
+DEFAULT_STICKY_SECONDS = 5
+PRIMARY = 'default'
+
+# Реплика, с которой читает текущий запрос к вьюсету, или None.
+_replica = ContextVar('read_replica', default=None)
+
+
+def current_replica():
+    return _replica.get()
+
+
+def replica_aliases():
+    return getattr(settings, 'REPLICA_DATABASES', [])
+
+
+def sticky_key(user_id):
+    return f'replica:sticky:{user_id}'
+
+
+def get_sticky_cache():
+    return caches[getattr(settings, 'REPLICA_STICKY_CACHE', 'default')]
+
+
+class ReplicaSelector:
+    """Выбирает реплику для запроса: по кругу или ту, что сейчас
+    обслуживает меньше запросов этого процесса."""
+
+    def __init__(self, aliases, strategy='round_robin'):
+        self.aliases = list(aliases)
+        self.strategy = strategy
+        self.active = dict.fromkeys(self.aliases, 0)
+        self._cycle = itertools.cycle(self.aliases)
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self.strategy == 'least_loaded':
+                alias = min(self.aliases, key=self.active.__getitem__)
+            else:
+                alias = next(self._cycle)
+            self.active[alias] += 1
+            return alias
+
+    def release(self, alias):
+        with self._lock:
+            self.active[alias] -= 1
+
+
+_selector = None
+_selector_lock = threading.Lock()
+
+
+def get_selector():
+    global _selector
+    with _selector_lock:
+        if _selector is None:
+            _selector = ReplicaSelector(
+                replica_aliases(),
+                getattr(settings, 'REPLICA_SELECTION', 'round_robin'))
+        return _selector
+
+
+class ReplicaRouter:
+    """Пишет в основную БД, читает с реплики, если её выбрал
+    ReplicaReadMixin для текущего запроса. Всё остальное (админка,
+    команды, запись и чтение после неё) идёт в основную БД.
+    Версии коллекций всегда читаются с основной БД: по ним строятся ETag
+    и ключи кэша ответов, и отставшая реплика закрепила бы старые."""
+
+    primary_models = {'api.collectionversion'}
+
+    def db_for_read(self, model, **hints):
+        if model._meta.label_lower in self.primary_models:
+            return PRIMARY
+        return _replica.get() or PRIMARY
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики получают схему вместе с данными от основной БД.
+        return db not in replica_aliases()
+
+
+class ReplicaReadMixin:
+    """Читает безопасные запросы вьюсета с реплики. Пользователь, только
+    что изменивший данные, несколько секунд читает с основной БД, чтобы
+    увидеть свои изменения (REPLICA_STICKY_SECONDS)."""
+
+    replica = None
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self.replica is not None:
+                _replica.reset(self._replica_token)
+                get_selector().release(self.replica)
+                self.replica = None
+
+    def initial(self, request, *args, **kwargs):
+        # Аутентификация и проверка прав читают из основной БД.
+        super().initial(request, *args, **kwargs)
+        if (request.method in SAFE_METHODS and replica_aliases()
+                and not self.is_sticky(request.user)):
+            self.replica = get_selector().acquire()
+            self._replica_token = _replica.set(self.replica)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if (request.method not in SAFE_METHODS
+                and request.user.is_authenticated
+                and response.status_code < 400):
+            get_sticky_cache().set(
+                sticky_key(request.user.pk), True,
+                getattr(settings, 'REPLICA_STICKY_SECONDS',
+                        DEFAULT_STICKY_SECONDS))
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    def is_sticky(self, user):
+        return (user.is_authenticated
+                and get_sticky_cache().get(sticky_key(user.pk)) is not None)
@@ -4,9 +4,35 @@ from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import DateTimeField
 from rest_framework.relations import SlugRelatedField
-
-from reviews.models import Comment, Review, Title, Genre, Category, User
-from .utils import validate_username, validate_email
+from rest_framework.validators import UniqueValidator
+
+from reviews.models import (Comment, Review, Title, Genre, Category, User,
+                            PurgeJob)
+from reviews.validators import validate_alphanumeric
+from .utils import (check_fields, requested_fields, validate_email,
+                    validate_username)
+
+
+class SparseFieldsMixin:
+    """При чтении оставляет только поля из ?fields= и раскрывает
+    поля из ?expand= сериализаторами из Meta.expandable."""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None or request.method != 'GET':
+            return fields
+        only, expand = requested_fields(request)
+        expandable = getattr(self.Meta, 'expandable', {})
+        readable = [name for name, field in fields.items()
+                    if not field.write_only]
+        check_fields(only, expand, readable, expandable)
+        for name in readable:
+            if only is not None and name not in only and name not in expand:
+                del fields[name]
+        for name in expand:
+            fields[name] = expandable[name](read_only=True)
+        return fields
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -39,6 +65,8 @@ class SignupSerializer(serializers.Serializer):
                 'Another user with this email already exists')
 
         user = User.objects.filter(username=data.get('username')).first()
+        if user and user.deleted_at:
+            raise serializers.ValidationError('This user is being deleted')
         if user and user.username == data.get(
                 'username') and user.email != data.get('email'):
             raise serializers.ValidationError('Wrong email already exists')
@@ -81,6 +109,7 @@ class TokenSerializer(serializers.Serializer):
         user = get_object_or_404(
             User,
             username=username,
+            deleted_at__isnull=True,
         )
         data['user'] = user
         return data
@@ -93,28 +122,48 @@ class GenreSerializer(serializers.ModelSerializer):
 
 
 class CategorySerializer(serializers.ModelSerializer):
+    # Условное ограничение уникальности DRF не проверяет сам.
+    slug = serializers.SlugField(max_length=50, validators=[
+        validate_alphanumeric,
+        UniqueValidator(queryset=Category.objects.filter(
+            deleted_at__isnull=True)),
+    ])
+
     class Meta:
         model = Category
-        exclude = ('id',)
+        fields = ('name', 'slug')
+
+
+class AuthorSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ('username', 'first_name', 'last_name', 'bio')
+
 
+class ReviewTitleSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Title
+        fields = ('id', 'name', 'year')
 
-class TitleReadSerializer(serializers.ModelSerializer):
+
+class TitleReadSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     category = CategorySerializer()
     genre = GenreSerializer(many=True)
-    rating = serializers.IntegerField()
+    rating = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Title
         fields = ('id', 'name', 'year', 'genre',
-                  'description', 'category', 'rating')
+                  'description', 'category', 'rating', 'review_count')
 
 
 class TitleWriteSerializer(serializers.ModelSerializer):
     genre = serializers.SlugRelatedField(slug_field='slug',
                                          queryset=Genre.objects.all(),
                                          many=True)
-    category = serializers.SlugRelatedField(slug_field='slug',
-                                            queryset=Category.objects.all())
+    category = serializers.SlugRelatedField(
+        slug_field='slug',
+        queryset=Category.objects.filter(deleted_at__isnull=True))
 
     class Meta:
         model = Title
@@ -129,7 +178,7 @@ class TitleWriteSerializer(serializers.ModelSerializer):
         return value
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = SlugRelatedField(slug_field='username', read_only=True,
                               default=serializers.CurrentUserDefault())
     pub_date = DateTimeField(read_only=True)
@@ -137,7 +186,10 @@ class ReviewSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Review
-        fields = ('id', 'author', 'pub_date', 'score', 'text', 'title')
+        fields = ('id', 'author', 'pub_date', 'score', 'text',
+                  'comment_count', 'title')
+        expandable = {'author': AuthorSerializer,
+                      'title': ReviewTitleSerializer}
 
     def validate_score(self, value):
         if value < 0 or value > 10:
@@ -157,7 +209,7 @@ class ReviewSerializer(serializers.ModelSerializer):
         return data
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = SlugRelatedField(slug_field='username', read_only=True,
                               default=serializers.CurrentUserDefault())
     pub_date = DateTimeField(read_only=True)
@@ -166,3 +218,20 @@ class CommentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Comment
         fields = ('id', 'text', 'author', 'pub_date', 'review')
+        expandable = {'author': AuthorSerializer}
+
+
+class SearchResultSerializer(serializers.Serializer):
+    type = serializers.CharField()
+    id = serializers.IntegerField()
+    title_id = serializers.IntegerField()
+    review_id = serializers.IntegerField(allow_null=True)
+    snippet = serializers.CharField()
+
+
+class PurgeJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PurgeJob
+        fields = ('id', 'model', 'object_id', 'object_repr', 'status',
+                  'total', 'deleted', 'created_at', 'started_at',
+                  'finished_at')
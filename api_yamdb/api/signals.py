@@ -0,0 +1,80 @@
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+
+from reviews.models import Category, Comment, Genre, Review, Title, User
+from .authentication import get_user_cache, user_cache_key
+from .cache import mark_changed
+from .models import ALL_COLLECTIONS
+
+# Поля пользователя, которые попадают в отзывы и комментарии.
+AUTHOR_FIELDS = ('username', 'first_name', 'last_name', 'bio')
+
+
+# Каждая модель сбрасывает коллекции всех ответов, в которые попадают
+# её поля, иначе старые ETag продолжат получать 304.
+@receiver(m2m_changed, sender=Title.genre.through)
+def invalidate_titles(sender, **kwargs):
+    mark_changed('titles')
+
+
+@receiver([post_save, post_delete], sender=Title)
+def invalidate_title(sender, instance, **kwargs):
+    # Название и год произведения есть в отзывах с ?expand=title.
+    mark_changed('titles', f'reviews:{instance.pk}')
+
+
+@receiver([post_save, post_delete], sender=Genre)
+def invalidate_genres(sender, **kwargs):
+    mark_changed('genres', 'titles')
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_categories(sender, **kwargs):
+    mark_changed('categories', 'titles')
+
+
+@receiver([post_save, post_delete], sender=Review)
+def invalidate_reviews(sender, instance, **kwargs):
+    mark_changed(f'reviews:{instance.title_id}', 'titles')
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def invalidate_comments(sender, instance, **kwargs):
+    # Число комментариев есть в списке отзывов произведения, поэтому
+    # сбрасываются и отзывы (прежнего и нового) произведения.
+    review_ids = {instance.review_id,
+                  getattr(instance, '_previous_review_id', None)} - {None}
+    if len(review_ids) == 1 and Comment.review.is_cached(instance):
+        title_ids = {instance.review.title_id}
+    else:
+        title_ids = set(Review.objects.filter(pk__in=review_ids)
+                        .values_list('title_id', flat=True))
+    mark_changed(*(f'comments:{pk}' for pk in review_ids),
+                 *(f'reviews:{pk}' for pk in title_ids))
+
+
+@receiver(pre_save, sender=User)
+def remember_author_fields(sender, instance, update_fields=None, **kwargs):
+    instance._previous_author = None
+    if instance.pk is not None and (
+            update_fields is None or set(update_fields) & set(AUTHOR_FIELDS)):
+        instance._previous_author = User.objects.filter(
+            pk=instance.pk).values_list(*AUTHOR_FIELDS).first()
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    cache = get_user_cache()
+    if cache is not None:
+        cache.delete(user_cache_key(instance.pk))
+
+
+@receiver(post_save, sender=User)
+def invalidate_authored(sender, instance, **kwargs):
+    # Имя и профиль автора есть в ответах со всеми его отзывами и
+    # комментариями, поэтому сбрасываются все коллекции.
+    previous = getattr(instance, '_previous_author', None)
+    if previous is not None and previous != tuple(
+            getattr(instance, field) for field in AUTHOR_FIELDS):
+        mark_changed(ALL_COLLECTIONS)
@@ -0,0 +1,152 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.template.response import SimpleTemplateResponse
+
+logger = logging.getLogger('api.timing')
+
+DEFAULT_SAMPLE_RATE = 0.01
+
+_current = ContextVar('request_timing', default=None)
+
+
+class RequestTiming:
+    """Время, потраченное запросом на SQL и на этапы обработки во вьюсете.
+    Время этапа не включает SQL-запросы, выполненные внутри него."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql = 0.0
+        self.stages = {}
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql += time.perf_counter() - started
+
+    @contextmanager
+    def stage(self, name):
+        started, sql = time.perf_counter(), self.sql
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started - (self.sql - sql)
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+    def header(self, total):
+        metrics = [f'db;dur={self.sql * 1000:.1f};desc="{self.queries} '
+                   'queries"']
+        metrics += [f'{name};dur={seconds * 1000:.1f}'
+                    for name, seconds in self.stages.items()]
+        metrics.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(metrics)
+
+    def as_dict(self, total):
+        return {
+            'queries': self.queries,
+            'sql_ms': round(self.sql * 1000, 1),
+            **{f'{name}_ms': round(seconds * 1000, 1)
+               for name, seconds in self.stages.items()},
+            'total_ms': round(total * 1000, 1),
+        }
+
+
+def current_timing():
+    return _current.get()
+
+
+@contextmanager
+def stage(name):
+    timing = current_timing()
+    if timing is None:
+        yield
+        return
+    with timing.stage(name):
+        yield
+
+
+class ServerTimingMiddleware:
+    """Замеряет выборку запросов (доля SERVER_TIMING_SAMPLE_RATE) и
+    отдаёт результат в заголовке Server-Timing и в лог api.timing."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'SERVER_TIMING_SAMPLE_RATE',
+                                   DEFAULT_SAMPLE_RATE)
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        timing = RequestTiming()
+        token = _current.set(timing)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - started
+        response['Server-Timing'] = timing.header(total)
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            **timing.as_dict(total),
+        }))
+        return response
+
+
+class TimedViewMixin:
+    """Разбивает время запроса к вьюсету на проверку доступа,
+    сериализацию и рендеринг, если запрос попал в выборку."""
+
+    def dispatch(self, request, *args, **kwargs):
+        timing = current_timing()
+        if timing is None:
+            return super().dispatch(request, *args, **kwargs)
+        # Обёртка ставится здесь, а не в middleware: асинхронные
+        # представления выполняют вьюсет в другом потоке и соединении.
+        # Оборачиваются все БД, включая реплики для чтения.
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(timing.execute))
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        with stage('auth'):
+            super().initial(request, *args, **kwargs)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if current_timing() is not None:
+            for method in ('to_representation', 'is_valid'):
+                setattr(serializer, method,
+                        self._timed(getattr(serializer, method)))
+        return serializer
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response,
+                                             *args, **kwargs)
+        if (current_timing() is not None
+                and isinstance(response, SimpleTemplateResponse)
+                and not response.is_rendered):
+            with stage('render'):
+                response.render()
+        return response
+
+    @staticmethod
+    def _timed(method):
+        def timed(*args, **kwargs):
+            with stage('serialize'):
+                return method(*args, **kwargs)
+        return timed
@@ -1,9 +1,15 @@
-from django.urls import include, path
+from django.urls import include, path, re_path
 from rest_framework.routers import DefaultRouter
 
+from reviews.export import EXPORTS, FORMATS
+from . import async_views
 from .views import (ReviewViewSet, CommentViewSet, TitleViewSet, GenreViewSet,
                     CategoryViewSet, UserViewSet, SignupView,
-                    TokenObtainPairView)
+                    TokenObtainPairView, CacheStatsView, SearchView,
+                    LeaderboardView, ExportView, PurgeJobListView)
+
+EXPORT_PATH = (rf'^v1/export/(?P<kind>{"|".join(EXPORTS)})\.'
+               rf'(?P<fmt>{"|".join(FORMATS)})(?P<compressed>\.gz)?$')
 
 router_v1 = DefaultRouter()
 router_v1.register(r'titles', TitleViewSet, basename='titles-read')
@@ -19,5 +25,23 @@ router_v1.register((r'titles/(?P<title_id>\d+)/reviews/'
 urlpatterns = [
     path('v1/auth/signup/', SignupView.as_view(), name='signup'),
     path('v1/auth/token/', TokenObtainPairView.as_view(), name='token'),
+    path('v1/search/', SearchView.as_view(), name='search'),
+    path('v1/leaderboards/<slug:kind>/', LeaderboardView.as_view(),
+         name='leaderboards'),
+    re_path(EXPORT_PATH, ExportView.as_view(), name='export'),
+    path('v1/purges/', PurgeJobListView.as_view(), name='purges'),
+    path('v1/cache/stats/', CacheStatsView.as_view(), name='cache-stats'),
     path('v1/', include(router_v1.urls)),
 ]
+
+# Асинхронные представления для чтения под ASGI (см. api_yamdb/asgi.py).
+# Подключаются перед обычными маршрутами и перекрывают их.
+async_urlpatterns = [
+    path('v1/titles/', async_views.title_list),
+    re_path(r'^v1/titles/(?P<pk>[^/.]+)/$', async_views.title_detail),
+    re_path(r'^v1/titles/(?P<title_id>\d+)/reviews/$',
+            async_views.review_list),
+    re_path(r'^v1/titles/(?P<title_id>\d+)/reviews/(?P<review_id>\d+)/'
+            r'comments/$', async_views.comment_list),
+    re_path(EXPORT_PATH, async_views.wsgi_only),
+]
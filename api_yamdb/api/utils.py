@@ -18,3 +18,27 @@ def validate_email(email):
     if len(email) > 254:
         raise serializers.ValidationError('Too long email')
     return email
+
+
+def requested_fields(request):
+    """Читает ?fields= и ?expand=. Возвращает множество полей (None —
+    все поля) и множество раскрываемых полей."""
+    def names(param):
+        return {name.strip() for name in
+                request.query_params.get(param, '').split(',')
+                if name.strip()}
+
+    return names('fields') or None, names('expand')
+
+
+def check_fields(fields, expand, available, expandable):
+    """Проверяет, что запрошены существующие поля."""
+    errors = {}
+    if fields and fields - set(available):
+        errors['fields'] = ('Неизвестные поля: '
+                            + ', '.join(sorted(fields - set(available))))
+    if expand - set(expandable):
+        errors['expand'] = ('Нельзя раскрыть: '
+                            + ', '.join(sorted(expand - set(expandable))))
+    if errors:
+        raise serializers.ValidationError(errors)
@@ -1,100 +1,153 @@
 from django.conf import settings
 from django.contrib.auth.tokens import default_token_generator
-from django.core.mail import send_mail
-from django.db.models import Avg
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import status, filters, viewsets
+from rest_framework import status, filters, generics, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from reviews.models import Title, Genre, Category, Review
+from reviews.export import export_chunks, file_name, gzipped
+from reviews.leaderboards import get_leaderboard, trending_days
+from reviews.models import (Title, Genre, Category, Review, Leaderboard,
+                            PurgeJob)
+from reviews.purge import soft_delete
+from reviews.search import KINDS, search_backend
+from users.models import OutboxEmail
+from .models import ALL_COLLECTIONS
+from .cache import CachedReadMixin, mark_changed, response_cache
+from .fast_serializers import (FastCommentSerializer, FastReviewSerializer,
+                               FastTitleSerializer)
 from .filters import TitleFilter
-from .mixins import CreateListDestroyMixin
+from .mixins import BatchIdsMixin, CreateListDestroyMixin, FastListMixin
+from .pagination import OptionalCursorPagination
 from .permissions import (IsAuthor, IsAdmin, IsModerator, ReadOnly,
                           IsSuperuser, IsYourself)
+from .replicas import ReplicaReadMixin
 from .serializers import (TitleReadSerializer, TitleWriteSerializer,
                           GenreSerializer, CategorySerializer,
                           CommentSerializer, ReviewSerializer, User,
-                          UserSerializer, SignupSerializer, TokenSerializer)
-
-
-class TitleViewSet(viewsets.ModelViewSet):
-    queryset = Title.objects.annotate(rating=Avg('reviews__score')
-                                      ).all().order_by('id')
+                          UserSerializer, SignupSerializer, TokenSerializer,
+                          SearchResultSerializer, PurgeJobSerializer)
+from .timing import TimedViewMixin
+from .utils import requested_fields
+
+
+class TitleViewSet(TimedViewMixin, ReplicaReadMixin, CachedReadMixin,
+                   BatchIdsMixin, FastListMixin, viewsets.ModelViewSet):
+    cache_namespace = 'titles'
+    queryset = Title.objects.visible().select_related(
+        'category').prefetch_related(
+        Prefetch('genre', queryset=Genre.objects.order_by('id'))
+    ).order_by('id')
+    fast_serializer_class = FastTitleSerializer
     permission_classes = [IsAdmin | ReadOnly]
     pagination_class = PageNumberPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = TitleFilter
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields, _ = requested_fields(self.request)
+        # Жанры читаются, только если они запрошены.
+        if (self.action == 'retrieve' and fields is not None
+                and 'genre' not in fields):
+            queryset = queryset.prefetch_related(None)
+        return self.retrieve_queryset(queryset)
+
     def get_serializer_class(self):
         if self.action in ['list', 'retrieve']:
             return TitleReadSerializer
         return TitleWriteSerializer
 
+    def perform_destroy(self, instance):
+        # Отзывы и комментарии произведения удаляются порциями
+        # в purge_deleted.
+        soft_delete(instance)
+        mark_changed(ALL_COLLECTIONS)
 
-class GenreViewSet(CreateListDestroyMixin):
+
+class GenreViewSet(TimedViewMixin, ReplicaReadMixin, CachedReadMixin,
+                   CreateListDestroyMixin):
+    cache_namespace = 'genres'
     queryset = Genre.objects.all().order_by('id')
     serializer_class = GenreSerializer
 
 
-class CategoryViewSet(CreateListDestroyMixin):
-    queryset = Category.objects.all().order_by('id')
+class CategoryViewSet(TimedViewMixin, ReplicaReadMixin, CachedReadMixin,
+                      CreateListDestroyMixin):
+    cache_namespace = 'categories'
+    queryset = Category.objects.filter(
+        deleted_at__isnull=True).order_by('id')
     serializer_class = CategorySerializer
 
+    def perform_destroy(self, instance):
+        # Произведения категории удаляются порциями в purge_deleted.
+        soft_delete(instance)
+        mark_changed(ALL_COLLECTIONS)
+
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(TimedViewMixin, ReplicaReadMixin, CachedReadMixin,
+                     FastListMixin, viewsets.ModelViewSet):
     serializer_class = CommentSerializer
+    fast_serializer_class = FastCommentSerializer
     permission_classes = [IsAdmin | IsModerator | IsAuthor | ReadOnly]
+    pagination_class = OptionalCursorPagination
 
-    def get_queryset(self):
-        title_id = self.kwargs['title_id']
-        review_id = self.kwargs['review_id']
+    def get_cache_namespace(self):
+        return f'comments:{self.kwargs["review_id"]}'
 
-        title = get_object_or_404(
-            Title.objects.prefetch_related('reviews', 'reviews__comments'),
-            id=title_id
-        )
+    def get_review(self):
+        return get_object_or_404(Review.objects.visible().only('id'),
+                                 id=self.kwargs['review_id'],
+                                 title_id=self.kwargs['title_id'])
 
-        return title.reviews.get(id=review_id).comments.all()
+    def get_queryset(self):
+        return self.retrieve_queryset(self.get_review().comments.filter(
+            author__deleted_at__isnull=True).select_related('author'))
 
     def perform_create(self, serializer):
-        title_id = self.kwargs['title_id']
-        title = get_object_or_404(Title, id=title_id)
-        review_id = self.kwargs['review_id']
-        review = get_object_or_404(title.reviews, id=review_id)
-
-        serializer.save(author=self.request.user, review=review)
+        serializer.save(author=self.request.user, review=self.get_review())
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(TimedViewMixin, ReplicaReadMixin, CachedReadMixin,
+                    FastListMixin, viewsets.ModelViewSet):
     serializer_class = ReviewSerializer
+    fast_serializer_class = FastReviewSerializer
     permission_classes = [IsAdmin | IsModerator | IsAuthor | ReadOnly]
+    pagination_class = OptionalCursorPagination
+
+    def get_cache_namespace(self):
+        return f'reviews:{self.kwargs["title_id"]}'
 
     def get_queryset(self):
         title_id = self.kwargs['title_id']
-        return Review.objects.filter(title__id=title_id)
+        return self.retrieve_queryset(Review.objects.visible().filter(
+            title__id=title_id).select_related('author'))
 
     def perform_create(self, serializer):
         title_id = self.kwargs['title_id']
-        title = get_object_or_404(Title, id=title_id)
+        title = get_object_or_404(Title.objects.visible(), id=title_id)
         serializer.save(author=self.request.user, title=title)
 
     def get_serializer_context(self):
         title_id = self.kwargs['title_id']
-        title = get_object_or_404(Title, id=title_id)
+        title = get_object_or_404(Title.objects.visible(), id=title_id)
 
         context = super().get_serializer_context()
         context.update({"title": title, 'author': self.request.user})
         return context
 
 
-class UserViewSet(viewsets.ModelViewSet):
-    queryset = User.objects.all()
+class UserViewSet(TimedViewMixin, viewsets.ModelViewSet):
+    queryset = User.objects.filter(deleted_at__isnull=True)
     serializer_class = UserSerializer
     permission_classes = [IsSuperuser | IsAdmin | IsYourself]
     pagination_class = PageNumberPagination
@@ -109,6 +162,12 @@ class UserViewSet(viewsets.ModelViewSet):
             return self.request.user
         return super().get_object()
 
+    def perform_destroy(self, instance):
+        # Отзывы и комментарии пользователя удаляются порциями
+        # в purge_deleted.
+        soft_delete(instance)
+        mark_changed(ALL_COLLECTIONS)
+
     def create(self, request, *args, **kwargs):
         email = request.data.get('email')
         if User.objects.filter(email=email).exists():
@@ -127,8 +186,11 @@ class UserViewSet(viewsets.ModelViewSet):
 
     @me.mapping.patch
     def me_patch(self, request):
+        # request.user может быть из кэша: сохраняем свежую копию,
+        # чтобы не затереть изменения, сделанные в другом процессе.
         serializer = self.get_serializer(
-            request.user, data=request.data, partial=True)
+            User.objects.get(pk=request.user.pk), data=request.data,
+            partial=True)
         serializer.is_valid(raise_exception=True)
         serializer.save()
         return Response(serializer.data)
@@ -138,7 +200,126 @@ class UserViewSet(viewsets.ModelViewSet):
         return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
 
-class SignupView(APIView):
+class SearchView(TimedViewMixin, generics.ListAPIView):
+    """Полнотекстовый поиск по произведениям, отзывам и комментариям.
+    Результаты отсортированы по релевантности."""
+
+    serializer_class = SearchResultSerializer
+    permission_classes = [ReadOnly]
+    pagination_class = PageNumberPagination
+
+    def get_queryset(self):
+        query = self.request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': 'Обязательный параметр'})
+        kinds = [kind for kind in
+                 self.request.query_params.get('type', '').split(',')
+                 if kind]
+        unknown = set(kinds) - set(KINDS)
+        if unknown:
+            raise ValidationError(
+                {'type': f'Неизвестный тип: {", ".join(sorted(unknown))}'})
+        return search_backend.search(query, kinds)
+
+
+class LeaderboardView(TimedViewMixin, generics.ListAPIView):
+    """Топ произведений из сохранённой таблицы рейтинга: лучшие по оценке
+    и по числу отзывов (во всём каталоге, в категории или жанре) и
+    самые обсуждаемые за последние дни."""
+
+    permission_classes = [ReadOnly]
+    pagination_class = PageNumberPagination
+
+    def get_scope(self):
+        kind = self.kwargs['kind']
+        params = self.request.query_params
+        if kind not in dict(Leaderboard.KINDS):
+            raise Http404
+        if kind == Leaderboard.TRENDING:
+            days = params.get('days', '7')
+            allowed = [str(days) for days in trending_days()]
+            if days not in allowed:
+                raise ValidationError(
+                    {'days': f'Допустимые значения: {", ".join(allowed)}'})
+            return f'days:{days}'
+        if 'category' in params and 'genre' in params:
+            raise ValidationError(
+                'Нельзя одновременно задать category и genre')
+        if 'category' in params:
+            get_object_or_404(Category, slug=params['category'],
+                              deleted_at__isnull=True)
+            return f'category:{params["category"]}'
+        if 'genre' in params:
+            get_object_or_404(Genre, slug=params['genre'])
+            return f'genre:{params["genre"]}'
+        return ''
+
+    def get_queryset(self):
+        leaderboard = get_leaderboard(self.kwargs['kind'], self.get_scope())
+        return leaderboard.entries.values('position', 'value', 'title_id')
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = FastTitleSerializer()
+        titles = {
+            title['id']: title for title in serializer.serialize(
+                serializer.rows(Title.objects.visible().filter(
+                    pk__in=[entry['title_id'] for entry in page])))
+        }
+        return self.get_paginated_response([
+            {'position': entry['position'], 'value': entry['value'],
+             'title': titles[entry['title_id']]}
+            for entry in page if entry['title_id'] in titles
+        ])
+
+
+class PurgeJobListView(generics.ListAPIView):
+    """Очереди удаления произведений, категорий и пользователей
+    с прогрессом."""
+
+    permission_classes = [IsSuperuser | IsAdmin]
+    pagination_class = PageNumberPagination
+    serializer_class = PurgeJobSerializer
+    queryset = PurgeJob.objects.order_by('-id')
+
+
+class CacheStatsView(APIView):
+    permission_classes = [IsSuperuser | IsAdmin]
+
+    def get(self, request):
+        return Response(response_cache.stats())
+
+
+class ExportView(APIView):
+    """Потоковая выгрузка произведений, отзывов или комментариев в NDJSON
+    или CSV со столбцами файлов load_data. ?after=<id> продолжает
+    выгрузку после этого id (CSV тогда без заголовка), суффикс .gz
+    сжимает её на лету."""
+
+    permission_classes = [IsSuperuser | IsAdmin]
+    content_types = {'ndjson': 'application/x-ndjson; charset=utf-8',
+                     'csv': 'text/csv; charset=utf-8'}
+
+    def get(self, request, kind, fmt, compressed=None):
+        after = request.query_params.get('after', '0')
+        # isdigit() пропускает и не-ASCII цифры, которые не берёт int().
+        if not (after.isascii() and after.isdigit()):
+            raise ValidationError({'after': 'Ожидается id.'})
+        after = int(after)
+        # Продолжение выгрузки дописывается в файл без заголовка CSV.
+        content = (chunk.encode() for chunk in
+                   export_chunks(kind, fmt, after, header=after == 0))
+        if compressed:
+            content = gzipped(content)
+        response = StreamingHttpResponse(
+            content, content_type=('application/gzip' if compressed
+                                   else self.content_types[fmt]))
+        response['Content-Disposition'] = (
+            f'attachment; filename="{file_name(kind, fmt, compressed)}"')
+        return response
+
+
+class SignupView(TimedViewMixin, APIView):
     serializer_class = SignupSerializer
     permission_classes = (AllowAny,)
 
@@ -146,21 +327,22 @@ class SignupView(APIView):
         serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        user, created = User.objects.get_or_create(
-            email=serializer.validated_data.get('email'),
-            username=serializer.validated_data.get('username')
-        )
+        with transaction.atomic():
+            user, created = User.objects.get_or_create(
+                email=serializer.validated_data.get('email'),
+                username=serializer.validated_data.get('username')
+            )
 
-        user.confirmation_code = default_token_generator.make_token(user)
-        user.save(update_fields=['confirmation_code'])
+            user.confirmation_code = default_token_generator.make_token(user)
+            user.save(update_fields=['confirmation_code'])
 
-        send_mail(
-            'Confirmation code',
-            f'Confirmation code: {user.confirmation_code}',
-            settings.ADMIN_EMAIL,
-            [user.email],
-            fail_silently=False,
-        )
+            # Письмо отправит команда send_emails.
+            OutboxEmail.objects.create(
+                subject='Confirmation code',
+                body=f'Confirmation code: {user.confirmation_code}',
+                from_email=settings.ADMIN_EMAIL,
+                to_email=user.email,
+            )
 
         return Response({
             'email': user.email,
@@ -168,7 +350,7 @@ class SignupView(APIView):
         }, status=status.HTTP_200_OK)
 
 
-class TokenObtainPairView(APIView):
+class TokenObtainPairView(TimedViewMixin, APIView):
     serializer_class = TokenSerializer
     permission_classes = (AllowAny,)
 
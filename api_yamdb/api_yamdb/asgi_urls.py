@@ -0,0 +1,9 @@
+from django.urls import include, path
+
+from api.urls import async_urlpatterns
+from .urls import urlpatterns as wsgi_urlpatterns
+
+urlpatterns = [
+    path('api/', include(async_urlpatterns)),
+    *wsgi_urlpatterns,
+]
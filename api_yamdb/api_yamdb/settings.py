@@ -28,6 +28,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.timing.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -37,7 +38,7 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'api_yamdb.urls'
+ROOT_URLCONF = os.getenv('DJANGO_ROOT_URLCONF', 'api_yamdb.urls')
 
 TEMPLATES_DIR = BASE_DIR / 'templates'
 TEMPLATES = [
@@ -67,6 +68,27 @@ DATABASES = {
     }
 }
 
+# Read replicas: DATABASE_REPLICAS is a comma-separated list of SQLite
+# files kept in sync with the primary database.
+
+REPLICA_DATABASES = []
+for number, name in enumerate(
+        filter(None, os.getenv('DATABASE_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['api.replicas.ReplicaRouter']
+
+# round_robin or least_loaded
+REPLICA_SELECTION = os.getenv('REPLICA_SELECTION', 'round_robin')
+
+# Users read from the primary for this many seconds after a write
+REPLICA_STICKY_SECONDS = 5
+
 # Password validation
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -113,6 +135,55 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 ADMIN_EMAIL = 'from@admins.com'
 
+# Response cache for anonymous reads
+
+RESPONSE_CACHE = {
+    'BACKEND': 'api.cache.LRUCacheBackend',
+    'OPTIONS': {'max_bytes': 64 * 1024 * 1024},
+    'TIMEOUT': 60,
+}
+
+if os.getenv('MEMCACHED_LOCATION'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': os.getenv('MEMCACHED_LOCATION'),
+        }
+    }
+    RESPONSE_CACHE = {
+        'BACKEND': 'api.cache.DjangoCacheBackend',
+        'OPTIONS': {'alias': 'default'},
+        'TIMEOUT': 60,
+    }
+    USER_CACHE_ALIAS = 'default'
+
+# Full-text search
+
+SEARCH_BACKEND = 'reviews.search.SQLiteFTSBackend'
+
+# Leaderboards: entries kept per leaderboard, the longest a review change
+# may wait before it shows up, allowed trending windows in days
+
+LEADERBOARD_SIZE = 100
+LEADERBOARD_MAX_STALENESS = 60
+LEADERBOARD_TRENDING_DAYS = (1, 7, 30)
+
+# Server-Timing instrumentation: share of requests that are measured
+
+SERVER_TIMING_SAMPLE_RATE = float(
+    os.getenv('SERVER_TIMING_SAMPLE_RATE', 1 if DEBUG else 0.01))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api.timing': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
 # JWT token
 
 REST_FRAMEWORK = {
@@ -121,13 +192,17 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
     ],
 
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 5,
 }
 
+# Authenticated users are cached for USER_CACHE_TIMEOUT seconds in the
+# shared USER_CACHE_ALIAS cache (set above when memcached is configured)
+USER_CACHE_TIMEOUT = 60
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=30),
     'AUTH_HEADER_TYPES': ('Bearer',),
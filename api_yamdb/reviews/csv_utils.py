@@ -0,0 +1,29 @@
+import csv
+import time
+from itertools import islice
+
+
+def read_batches(file, batch_size):
+    """Построчно читает CSV и отдаёт строки пачками по batch_size."""
+    with open(file, encoding='utf-8', newline='') as csvfile:
+        reader = csv.DictReader(csvfile)
+        while True:
+            batch = list(islice(reader, batch_size))
+            if not batch:
+                return
+            yield batch
+
+
+def parse_to_queue(file, batch_size, queue):
+    """Разбирает CSV в отдельном процессе и складывает пачки в очередь.
+    Последним элементом кладёт None и время разбора в секундах."""
+    parse_time = 0.0
+    try:
+        started = time.perf_counter()
+        for batch in read_batches(file, batch_size):
+            parse_time += time.perf_counter() - started
+            queue.put(batch)
+            started = time.perf_counter()
+        parse_time += time.perf_counter() - started
+    finally:
+        queue.put((None, parse_time))
@@ -0,0 +1,93 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Comment, Review, Title
+
+DEFAULT_CHUNK_SIZE = 2000
+FORMATS = ('ndjson', 'csv')
+# Тип выгрузки: модель, имя файла для load_data и его столбцы.
+EXPORTS = {
+    'titles': (Title, 'titles',
+               ('id', 'name', 'year', 'category_id', 'description')),
+    'reviews': (Review, 'review',
+                ('id', 'title_id', 'text', 'author_id', 'score',
+                 'pub_date')),
+    'comments': (Comment, 'comments',
+                 ('id', 'review_id', 'text', 'author_id', 'pub_date')),
+}
+
+encoder = DjangoJSONEncoder()
+
+
+def chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+
+
+def file_name(kind, fmt, compressed=False):
+    return f'{EXPORTS[kind][1]}.{fmt}' + ('.gz' if compressed else '')
+
+
+def export_rows(kind, after=0, size=None):
+    """Отдаёт пачки строк (кортежей столбцов) по возрастанию id после
+    after. Каждая пачка читается отдельным запросом по индексу id,
+    поэтому память не зависит от размера таблицы, а прерванную выгрузку
+    можно продолжить с последнего выгруженного id. Мягко удалённые
+    записи не выгружаются."""
+    model, _, columns = EXPORTS[kind]
+    size = size or chunk_size()
+    while True:
+        rows = list(model.objects.visible().filter(pk__gt=after)
+                    .order_by('pk')
+                    .values_list(*columns)[:size])
+        if rows:
+            yield rows
+        if len(rows) < size:
+            return
+        after = rows[-1][0]
+
+
+def cell(value):
+    # Даты в том же формате, что в исходных CSV и в JSON.
+    if isinstance(value, datetime):
+        return encoder.default(value)
+    return value
+
+
+def export_chunks(kind, fmt, after=0, header=True):
+    """Текст выгрузки в формате ndjson или csv, по куску на пачку строк.
+    Заголовок CSV пропускается, когда выгрузка дописывается в файл."""
+    columns = EXPORTS[kind][2]
+    if fmt == 'ndjson':
+        for rows in export_rows(kind, after):
+            yield ''.join(
+                json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder,
+                           ensure_ascii=False) + '\n'
+                for row in rows)
+        return
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(columns)
+    for rows in export_rows(kind, after):
+        writer.writerows([cell(value) for value in row] for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzipped(chunks):
+    """Сжимает поток байтов в gzip по мере поступления."""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
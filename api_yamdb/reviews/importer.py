@@ -0,0 +1,398 @@
+import hashlib
+import json
+import time
+from contextlib import contextmanager
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor,
+                                ThreadPoolExecutor, wait)
+from multiprocessing import get_context
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .csv_utils import parse_to_queue, read_batches
+from .models import RowFingerprint
+
+DEFAULT_BATCH_SIZE = 1000
+# Сколько разобранных пачек одного файла может ждать записи в БД.
+QUEUE_SIZE = 4
+# Временная таблица id строк файла, встреченных при синхронизации.
+SEEN_TABLE = 'sync_seen_ids'
+
+
+def foreign_keys(model):
+    return [field for field in model._meta.concrete_fields
+            if field.is_relation]
+
+
+def dependencies(models):
+    """Для каждой модели возвращает модели из списка, на которые она
+    ссылается внешними ключами."""
+    return {
+        model: {field.related_model for field in foreign_keys(model)
+                if field.related_model in models
+                and field.related_model is not model}
+        for model in models
+    }
+
+
+def dependency_order(files):
+    """Упорядочивает пары (файл, модель) так, чтобы каждый файл шёл
+    после файлов моделей, на которые он ссылается."""
+    graph = dependencies([model for _, model in files])
+    ordered, loaded, pending = [], set(), list(files)
+    while pending:
+        ready = [(file, model) for file, model in pending
+                 if graph[model] <= loaded]
+        if not ready:
+            raise ValueError('Circular dependency between '
+                             f'{", ".join(file for file, _ in pending)}')
+        for item in ready:
+            pending.remove(item)
+            loaded.add(item[1])
+        ordered.extend(ready)
+    return ordered
+
+
+def resolve_foreign_keys(model, rows):
+    """Отбрасывает строки, ссылающиеся на несуществующие объекты.
+    Проверяет все ссылки пачки одним запросом на каждый внешний ключ."""
+    for field in foreign_keys(model):
+        values = {row[field.attname] for row in rows
+                  if row.get(field.attname)}
+        if not values:
+            continue
+        existing = {
+            str(pk) for pk in field.related_model.objects.filter(
+                pk__in=values).values_list('pk', flat=True)
+        }
+        rows = [row for row in rows
+                if not row.get(field.attname)
+                or row[field.attname] in existing]
+    return rows
+
+
+def auto_date_fields(model):
+    return [field for field in model._meta.concrete_fields
+            if getattr(field, 'auto_now', False)
+            or getattr(field, 'auto_now_add', False)]
+
+
+@contextmanager
+def csv_dates(model):
+    """Отключает auto_now и auto_now_add полей модели на время загрузки:
+    иначе bulk_create заменит даты из CSV (например, pub_date отзывов)
+    временем загрузки."""
+    fields = auto_date_fields(model)
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def instances(model, rows):
+    """Объекты для bulk_create внутри csv_dates: пустые даты, которые
+    обычно ставит auto_now_add, заполняются текущим временем."""
+    now = timezone.now()
+    dates = [field.attname for field in auto_date_fields(model)]
+    return [model(**{**row, **{name: row.get(name) or now
+                               for name in dates}})
+            for row in rows]
+
+
+def truncate(models):
+    """Очищает таблицы моделей (и ссылающиеся на них) без загрузки
+    объектов в память."""
+    tables = [model._meta.db_table for model in models]
+    connection.ops.execute_sql_flush(
+        connection.ops.sql_flush(no_style(), tables, allow_cascade=True))
+
+
+def write_batches(model, batches, batch_size=DEFAULT_BATCH_SIZE):
+    """Записывает пачки строк через bulk_create, каждую пачку —
+    в отдельной транзакции. Возвращает статистику загрузки."""
+    stats = {'rows': 0, 'skipped': 0, 'read': 0.0, 'write': 0.0}
+    started = time.perf_counter()
+    for batch in batches:
+        read = time.perf_counter()
+        stats['read'] += read - started
+        rows = resolve_foreign_keys(model, batch)
+        with transaction.atomic(), csv_dates(model):
+            model.objects.bulk_create(instances(model, rows),
+                                      batch_size=batch_size)
+        stats['rows'] += len(rows)
+        stats['skipped'] += len(batch) - len(rows)
+        started = time.perf_counter()
+        stats['write'] += started - read
+    stats['read'] += time.perf_counter() - started
+    return stats
+
+
+def queued_batches(queue, stats):
+    while True:
+        item = queue.get()
+        if isinstance(item, tuple):
+            stats['parse'] = item[1]
+            return
+        yield item
+
+
+def import_csv(file, model, batch_size=DEFAULT_BATCH_SIZE):
+    """Загружает CSV, разбирая его в текущем процессе."""
+    stats = write_batches(model, read_batches(file, batch_size), batch_size)
+    stats['parse'] = stats['read']
+    return stats
+
+
+def import_queue(model, queue, batch_size):
+    """Загружает пачки, которые разбирает другой процесс."""
+    parse_stats = {}
+    stats = write_batches(model, queued_batches(queue, parse_stats),
+                          batch_size)
+    stats.update(parse_stats)
+    return stats
+
+
+def load_files(files, batch_size=DEFAULT_BATCH_SIZE, jobs=1,
+               concurrent_writes=False):
+    """Загружает пары (файл, модель) в порядке зависимостей.
+
+    При jobs > 1 файлы разбираются в отдельных процессах, пока основной
+    поток пишет в БД. С concurrent_writes независимые файлы ещё и
+    записываются одновременно в jobs потоках, каждый со своим
+    соединением. Возвращает статистику по каждому файлу."""
+    files = dependency_order(files)
+    if jobs <= 1:
+        return {file: import_csv(file, model, batch_size)
+                for file, model in files}
+    # Процессы разбора не наследуют соединения с БД родителя.
+    context = get_context('spawn')
+    with context.Manager() as manager, ProcessPoolExecutor(
+            jobs, mp_context=context) as parsers:
+        if concurrent_writes:
+            return _write_concurrently(files, manager, parsers,
+                                       batch_size, jobs)
+        # Разбор запускается заранее в порядке зависимостей: пока
+        # основной поток пишет файл, следующие уже разбираются.
+        queues, parsed = {}, []
+        for file, _ in files:
+            queues[file] = manager.Queue(QUEUE_SIZE)
+            parsed.append(parsers.submit(parse_to_queue, file, batch_size,
+                                         queues[file]))
+        results = {file: import_queue(model, queues[file], batch_size)
+                   for file, model in files}
+        for future in parsed:
+            future.result()
+        return results
+
+
+def _write_in_thread(file, model, manager, parsers, batch_size):
+    queue = manager.Queue(QUEUE_SIZE)
+    parsed = parsers.submit(parse_to_queue, file, batch_size, queue)
+    try:
+        stats = import_queue(model, queue, batch_size)
+    finally:
+        connection.close()
+    parsed.result()
+    return stats
+
+
+def _write_concurrently(files, manager, parsers, batch_size, jobs):
+    graph = dependencies([model for _, model in files])
+    pending, running, loaded, results = list(files), {}, set(), {}
+    with ThreadPoolExecutor(jobs) as writers:
+        while pending or running:
+            for file, model in [item for item in pending
+                                if graph[item[1]] <= loaded]:
+                pending.remove((file, model))
+                future = writers.submit(_write_in_thread, file, model,
+                                        manager, parsers, batch_size)
+                running[future] = (file, model)
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                file, model = running.pop(future)
+                results[file] = future.result()
+                loaded.add(model)
+    return results
+
+
+def fingerprint(row):
+    return hashlib.sha1(json.dumps(row, sort_keys=True, ensure_ascii=False)
+                        .encode()).hexdigest()
+
+
+def changed_rows(file, model, batch_size):
+    """Сравнивает строки CSV с отпечатками прошлой синхронизации.
+    Возвращает изменённые и новые строки с их отпечатками, id строк,
+    исчезнувших из файла, и число неизменённых строк.
+
+    Отпечатки читаются по id каждой пачки файла, а встреченные id
+    складываются во временную таблицу: исчезнувшие строки находит
+    запрос к БД, и все отпечатки таблицы в память не загружаются."""
+    table = model._meta.db_table
+    insert = (f'{connection.ops.insert_statement(ignore_conflicts=True)} '
+              f'{SEEN_TABLE} (id) VALUES (%s) '
+              f'{connection.ops.ignore_conflicts_suffix_sql(True)}')
+    changed, unchanged = {}, 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {SEEN_TABLE}')
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE {SEEN_TABLE} (id bigint PRIMARY KEY)')
+        try:
+            for batch in read_batches(file, batch_size):
+                rows = {int(row['id']): row for row in batch}
+                stored = dict(RowFingerprint.objects.filter(
+                    table=table, row_id__in=list(rows),
+                ).values_list('row_id', 'digest'))
+                for row_id, row in rows.items():
+                    digest = fingerprint(row)
+                    if stored.get(row_id) == digest:
+                        unchanged += 1
+                    else:
+                        changed[row_id] = (row, digest)
+                cursor.executemany(insert, [(row_id,) for row_id in rows])
+            cursor.execute(
+                f'SELECT f.row_id FROM {RowFingerprint._meta.db_table} f '
+                f'WHERE f.{connection.ops.quote_name("table")} = %s '
+                f'AND NOT EXISTS (SELECT 1 FROM {SEEN_TABLE} s '
+                'WHERE s.id = f.row_id) ORDER BY f.row_id', [table])
+            removed = [row_id for row_id, in cursor.fetchall()]
+        finally:
+            cursor.execute(f'DROP TABLE {SEEN_TABLE}')
+    return changed, removed, unchanged
+
+
+def related_ids(model, row_ids):
+    """id объектов, на которые ссылаются строки, по внешним ключам."""
+    related = {}
+    for values in model.objects.filter(pk__in=row_ids).values(
+            *(field.attname for field in foreign_keys(model))):
+        for attname, value in values.items():
+            related.setdefault(attname, set()).add(value)
+    return related
+
+
+def upsert_rows(model, changed, batch_size=DEFAULT_BATCH_SIZE):
+    """Вставляет новые и обновляет изменённые строки пачками через
+    bulk_create и bulk_update и запоминает их отпечатки. Строки, которые
+    уже есть в таблице, но не имеют отпечатка (например, созданные через
+    API), обновляются. Возвращает статистику, id записанных строк и id
+    связанных объектов до и после изменения."""
+    stats = {'inserted': 0, 'updated': 0, 'skipped': 0}
+    written, related = set(), {}
+    table = model._meta.db_table
+    items = list(changed.values())
+    for start in range(0, len(items), batch_size):
+        batch = items[start:start + batch_size]
+        digests = {row['id']: digest for row, digest in batch}
+        rows = resolve_foreign_keys(model, [row for row, _ in batch])
+        row_ids = [int(row['id']) for row in rows]
+        existing = set(model.objects.filter(pk__in=row_ids)
+                       .values_list('pk', flat=True))
+        for attname, values in related_ids(model, existing).items():
+            related.setdefault(attname, set()).update(values)
+        new = instances(model, [row for row in rows
+                                if int(row['id']) not in existing])
+        updated = [model(**row) for row in rows
+                   if int(row['id']) in existing]
+        with transaction.atomic(), csv_dates(model):
+            model.objects.bulk_create(new, batch_size=batch_size)
+            if updated:
+                model.objects.bulk_update(
+                    updated, [name for name in rows[0] if name != 'id'],
+                    batch_size=batch_size)
+            RowFingerprint.objects.filter(
+                table=table, row_id__in=row_ids).delete()
+            RowFingerprint.objects.bulk_create(
+                [RowFingerprint(table=table, row_id=int(row['id']),
+                                digest=digests[row['id']]) for row in rows],
+                batch_size=batch_size)
+        for attname, values in related_ids(model, row_ids).items():
+            related.setdefault(attname, set()).update(values)
+        written.update(row_ids)
+        stats['inserted'] += len(new)
+        stats['updated'] += len(updated)
+        stats['skipped'] += len(batch) - len(rows)
+    return stats, written, related
+
+
+def delete_rows(model, row_ids, batch_size=DEFAULT_BATCH_SIZE):
+    """Удаляет строки, исчезнувшие из файла, вместе с их отпечатками.
+    Удаление идёт через ORM, поэтому срабатывают сигналы моделей."""
+    table = model._meta.db_table
+    for start in range(0, len(row_ids), batch_size):
+        batch = row_ids[start:start + batch_size]
+        with transaction.atomic():
+            model.objects.filter(pk__in=batch).delete()
+            RowFingerprint.objects.filter(
+                table=table, row_id__in=batch).delete()
+    return len(row_ids)
+
+
+def drop_orphan_fingerprints(model):
+    """Удаляет отпечатки строк, которых уже нет в таблице: например,
+    удалённых каскадом вместе с родителем. Иначе следующая синхронизация
+    сочла бы такие строки неизменёнными и не вставила бы их заново."""
+    return RowFingerprint.objects.filter(
+        table=model._meta.db_table,
+    ).exclude(row_id__in=model.objects.values('pk')).delete()[0]
+
+
+def record_fingerprints(files, batch_size=DEFAULT_BATCH_SIZE):
+    """Запоминает отпечатки строк, загруженных из пар (файл, модель)
+    обычной загрузкой, чтобы следующая синхронизация сверялась с ними.
+    Строки, которых нет в таблице (пропущенные при загрузке), не
+    запоминаются."""
+    for file, model in files:
+        table = model._meta.db_table
+        for batch in read_batches(file, batch_size):
+            digests = {int(row['id']): fingerprint(row) for row in batch}
+            existing = model.objects.filter(
+                pk__in=list(digests)).values_list('pk', flat=True)
+            with transaction.atomic():
+                RowFingerprint.objects.filter(
+                    table=table, row_id__in=list(digests)).delete()
+                RowFingerprint.objects.bulk_create(
+                    [RowFingerprint(table=table, row_id=row_id,
+                                    digest=digests[row_id])
+                     for row_id in existing],
+                    batch_size=batch_size)
+
+
+def sync_files(files, batch_size=DEFAULT_BATCH_SIZE):
+    """Приводит таблицы к содержимому пар (файл, модель), применяя только
+    разницу с прошлой загрузкой. Сначала в обратном порядке зависимостей
+    удаляются строки, исчезнувшие из файлов (только пришедшие из прошлых
+    файлов), чтобы освободить уникальные значения, затем в прямом порядке
+    вставляются и обновляются изменённые строки. Удаление и запись идут
+    в одной транзакции: ошибка записи откатывает и удаления, и таблицы
+    не остаются синхронизированными наполовину. Возвращает статистику
+    по каждому файлу: числа строк, id записанных строк (written) и
+    связанных с ними объектов (related)."""
+    files = dependency_order(files)
+    results, diffs = {}, {}
+    for file, model in files:
+        started = time.perf_counter()
+        changed, removed, unchanged = changed_rows(file, model, batch_size)
+        diffs[file] = changed, removed
+        results[file] = {'unchanged': unchanged,
+                         'diff': time.perf_counter() - started}
+    with transaction.atomic():
+        for file, model in reversed(files):
+            started = time.perf_counter()
+            results[file]['deleted'] = delete_rows(model, diffs[file][1],
+                                                   batch_size)
+            results[file]['write'] = time.perf_counter() - started
+        for file, model in files:
+            drop_orphan_fingerprints(model)
+        for file, model in files:
+            started = time.perf_counter()
+            stats, written, related = upsert_rows(model, diffs[file][0],
+                                                  batch_size)
+            results[file].update(stats, written=written, related=related)
+            results[file]['write'] += time.perf_counter() - started
+    return results
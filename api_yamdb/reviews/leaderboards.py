@@ -0,0 +1,133 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Leaderboard, LeaderboardEntry, Review, Title
+
+DEFAULT_SIZE = 100
+DEFAULT_MAX_STALENESS = 60
+DEFAULT_TRENDING_DAYS = (1, 7, 30)
+
+
+def leaderboard_size():
+    return getattr(settings, 'LEADERBOARD_SIZE', DEFAULT_SIZE)
+
+
+def max_staleness():
+    return timedelta(seconds=getattr(settings, 'LEADERBOARD_MAX_STALENESS',
+                                     DEFAULT_MAX_STALENESS))
+
+
+def trending_days():
+    return getattr(settings, 'LEADERBOARD_TRENDING_DAYS',
+                   DEFAULT_TRENDING_DAYS)
+
+
+def scoped_titles(scope):
+    """Видимые произведения области: '' — все, 'category:<slug>',
+    'genre:<slug>'."""
+    titles = Title.objects.visible()
+    if scope.startswith('category:'):
+        return titles.filter(category__slug=scope.partition(':')[2])
+    if scope.startswith('genre:'):
+        return titles.filter(genre__slug=scope.partition(':')[2])
+    return titles
+
+
+def ranking(kind, scope):
+    """Считает топ заново: список пар (id произведения, значение)."""
+    size = leaderboard_size()
+    if kind == Leaderboard.TRENDING:
+        since = timezone.now() - timedelta(days=int(scope.partition(':')[2]))
+        return list(
+            Review.objects.visible().filter(pub_date__gte=since).order_by()
+            .values('title').annotate(value=Count('id'))
+            .order_by('-value', 'title').values_list('title', 'value')[:size]
+        )
+    titles = scoped_titles(scope).filter(review_count__gt=0)
+    if kind == Leaderboard.TOP_RATED:
+        titles = titles.annotate(
+            value=F('score_sum') / F('review_count')
+        ).order_by('-value', '-review_count', 'id')
+    else:
+        titles = titles.annotate(
+            value=F('review_count')).order_by('-value', 'id')
+    return list(titles.values_list('id', 'value')[:size])
+
+
+def refresh(leaderboard):
+    """Пересчитывает топ и снимает отметку об изменениях, сделанных
+    до начала пересчёта. Более поздние изменения оставят её на месте."""
+    started = timezone.now()
+    rows = ranking(leaderboard.kind, leaderboard.scope)
+    with transaction.atomic():
+        leaderboard.entries.all().delete()
+        LeaderboardEntry.objects.bulk_create(
+            LeaderboardEntry(leaderboard=leaderboard, position=position,
+                             title_id=title_id, value=value)
+            for position, (title_id, value) in enumerate(rows, 1)
+        )
+        Leaderboard.objects.filter(pk=leaderboard.pk).update(
+            refreshed_at=started)
+        Leaderboard.objects.filter(
+            pk=leaderboard.pk, dirty_since__lte=started
+        ).update(dirty_since=None)
+    leaderboard.refreshed_at = started
+    return leaderboard
+
+
+def needs_refresh(leaderboard, max_age=None):
+    """Топ пересчитывается, когда изменение отзывов ждёт дольше max_age
+    (по умолчанию LEADERBOARD_MAX_STALENESS). Окно «в тренде» сдвигается
+    само, поэтому такой топ устаревает и без изменений."""
+    deadline = timezone.now() - (
+        max_staleness() if max_age is None else max_age)
+    if leaderboard.kind == Leaderboard.TRENDING:
+        return leaderboard.refreshed_at <= deadline
+    return (leaderboard.dirty_since is not None
+            and leaderboard.dirty_since <= deadline)
+
+
+def get_leaderboard(kind, scope=''):
+    """Возвращает сохранённый топ, при необходимости пересчитав его."""
+    leaderboard = Leaderboard.objects.filter(kind=kind, scope=scope).first()
+    if leaderboard is None:
+        # Топ создаётся и заполняется в одной транзакции: параллельный
+        # запрос дождётся её и не увидит пустой топ.
+        try:
+            with transaction.atomic():
+                return refresh(Leaderboard.objects.create(
+                    kind=kind, scope=scope, refreshed_at=timezone.now()))
+        except IntegrityError:
+            return Leaderboard.objects.get(kind=kind, scope=scope)
+    if needs_refresh(leaderboard):
+        return refresh(leaderboard)
+    return leaderboard
+
+
+def mark_dirty(title_id=None):
+    """Отмечает топы, в которые может входить произведение, как
+    устаревшие. Без title_id отмечаются все топы."""
+    leaderboards = Leaderboard.objects.filter(dirty_since__isnull=True)
+    if title_id is not None:
+        scopes = [''] + [
+            f'category:{slug}' for slug in Title.objects.filter(
+                pk=title_id).values_list('category__slug', flat=True)
+        ] + [
+            f'genre:{slug}' for slug in Title.genre.through.objects.filter(
+                title_id=title_id).values_list('genre__slug', flat=True)
+        ]
+        leaderboards = leaderboards.filter(scope__in=scopes)
+    return leaderboards.update(dirty_since=timezone.now())
+
+
+def refresh_stale(max_age=None):
+    """Пересчитывает все топы, которым это нужно. Возвращает их число."""
+    stale = [leaderboard for leaderboard in Leaderboard.objects.all()
+             if needs_refresh(leaderboard, max_age)]
+    for leaderboard in stale:
+        refresh(leaderboard)
+    return len(stale)
@@ -0,0 +1,245 @@
+import json
+import platform
+import statistics
+import time
+from datetime import datetime, timezone
+
+import django
+from django.contrib.auth.tokens import default_token_generator
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api.cache import LRUCacheBackend, response_cache
+from reviews.models import Comment, Genre, Review, Title, User
+
+
+def titles_list(client, data, number):
+    return client.get('/api/v1/titles/')
+
+
+def titles_filtered(client, data, number):
+    return client.get(f'/api/v1/titles/?genre={data["genre"]}'
+                      f'&year={data["year"]}')
+
+
+def title_detail(client, data, number):
+    return client.get(f'/api/v1/titles/{data["title_id"]}/')
+
+
+def titles_batch(client, data, number):
+    return client.get(f'/api/v1/titles/?ids={data["batch_ids"]}')
+
+
+def reviews_list(client, data, number):
+    return client.get(f'/api/v1/titles/{data["title_id"]}/reviews/')
+
+
+def reviews_cursor(client, data, number):
+    return client.get(f'/api/v1/titles/{data["title_id"]}/reviews/'
+                      '?pagination=cursor')
+
+
+def comments_list(client, data, number):
+    return client.get(f'/api/v1/titles/{data["title_id"]}/reviews/'
+                      f'{data["review_id"]}/comments/')
+
+
+def signup(client, data, number):
+    return client.post('/api/v1/auth/signup/', {
+        'username': f'bench{number}', 'email': f'bench{number}@example.com'})
+
+
+def token(client, data, number):
+    return client.post('/api/v1/auth/token/', {
+        'username': data['user'].username,
+        'confirmation_code': data['confirmation_code']})
+
+
+def review_create(client, data, number):
+    # Отзыв на произведение можно оставить один раз, поэтому каждый
+    # запрос идёт к следующему произведению.
+    title_id = data['free_titles'][number]
+    return client.post(f'/api/v1/titles/{title_id}/reviews/', {
+        'text': 'Benchmark review', 'score': number % 10 + 1})
+
+
+# Имя сценария: (функция, ожидаемый статус, клиент). Клиент 'read'
+# аутентифицирован, если не задан --anonymous; 'anonymous' и 'user' —
+# всегда без токена и всегда с токеном.
+SCENARIOS = {
+    'titles-list': (titles_list, 200, 'read'),
+    'titles-filtered': (titles_filtered, 200, 'read'),
+    'title-detail': (title_detail, 200, 'read'),
+    'titles-batch': (titles_batch, 200, 'read'),
+    'reviews-list': (reviews_list, 200, 'read'),
+    'reviews-cursor': (reviews_cursor, 200, 'read'),
+    'comments-list': (comments_list, 200, 'read'),
+    'signup': (signup, 200, 'anonymous'),
+    'token': (token, 200, 'anonymous'),
+    'review-create': (review_create, 201, 'user'),
+}
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = round(percent / 100 * (len(ordered) - 1))
+    return ordered[index]
+
+
+def summarize(latencies, queries, elapsed):
+    return {
+        'requests': len(latencies),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'queries_per_request': round(statistics.mean(queries), 2),
+    }
+
+
+class Command(BaseCommand):
+    help = "Measures API throughput, latency and SQL queries per request"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Number of measured requests per scenario',
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=10,
+            help='Number of unmeasured requests before each scenario',
+        )
+        parser.add_argument(
+            '--scenario', action='append', choices=SCENARIOS,
+            help='Scenario to run, can be repeated (default: all)',
+        )
+        parser.add_argument(
+            '--anonymous', action='store_true',
+            help='Read without a token, through the response cache',
+        )
+        parser.add_argument(
+            '--output', default='bench_results.json',
+            help='JSON file the results are written to',
+        )
+        parser.add_argument(
+            '--compare',
+            help='JSON file of a previous run to compare against',
+        )
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be positive')
+        started = datetime.now(timezone.utc)
+        baseline = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                baseline = json.load(file)
+
+        # Всё, что создают сценарии записи, откатывается после прогона.
+        with transaction.atomic():
+            data = self.prepare()
+            results = {
+                name: self.run(name, data, options)
+                for name in options['scenario'] or SCENARIOS
+            }
+            transaction.set_rollback(True)
+
+        report = {
+            'metadata': {
+                'started': started.isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'dataset': {
+                    'titles': Title.objects.count(),
+                    'reviews': Review.objects.count(),
+                    'comments': Comment.objects.count(),
+                    'users': User.objects.count(),
+                },
+                'requests': options['requests'],
+                'warmup': options['warmup'],
+                'anonymous': options['anonymous'],
+            },
+            'scenarios': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+
+        for name, stats in results.items():
+            self.stdout.write(
+                f'{name}: {stats["rps"]} req/s, p50 {stats["p50_ms"]} ms, '
+                f'p95 {stats["p95_ms"]} ms, p99 {stats["p99_ms"]} ms, '
+                f'{stats["queries_per_request"]} queries'
+                + self.difference(name, stats, baseline)
+            )
+        self.stdout.write(f'Results are written to {options["output"]}')
+
+    def prepare(self):
+        """Выбирает объекты, к которым обращаются сценарии, и заводит
+        пользователя, от имени которого они выполняются."""
+        review = Review.objects.filter(
+            comments__isnull=False).order_by('id').first()
+        genre = Genre.objects.filter(title__isnull=False).first()
+        if review is None or genre is None:
+            raise CommandError('Not enough data to benchmark, '
+                               'run generate_data and load_data first')
+        user, _ = User.objects.get_or_create(
+            username='benchmark', defaults={'email': 'benchmark@example.com'})
+        free_titles = list(
+            Title.objects.exclude(reviews__author=user)
+            .order_by('id').values_list('id', flat=True))
+        return {
+            'title_id': review.title_id,
+            'review_id': review.pk,
+            'genre': genre.slug,
+            'year': genre.title_set.values_list('year', flat=True).first(),
+            'user': user,
+            'confirmation_code': default_token_generator.make_token(user),
+            'free_titles': free_titles,
+            # Карусель из 30 произведений вразброс.
+            'batch_ids': ','.join(map(str, free_titles[::-7][:30])),
+        }
+
+    def client(self, data, anonymous):
+        client = APIClient()
+        if not anonymous:
+            access = RefreshToken.for_user(data['user']).access_token
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        return client
+
+    def run(self, name, data, options):
+        scenario, expected, kind = SCENARIOS[name]
+        # Каждый сценарий начинается с пустого кэша этого процесса.
+        response_cache.backend = LRUCacheBackend()
+        client = self.client(data, kind == 'anonymous' or (
+            kind == 'read' and options['anonymous']))
+        if name == 'review-create' and len(data['free_titles']) < (
+                options['warmup'] + options['requests']):
+            raise CommandError(
+                'review-create needs a title per request, '
+                f'only {len(data["free_titles"])} are available')
+
+        latencies, queries = [], []
+        for number in range(options['warmup'] + options['requests']):
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = scenario(client, data, number)
+                elapsed = time.perf_counter() - started
+            if response.status_code != expected:
+                raise CommandError(
+                    f'{name} returned {response.status_code}: '
+                    f'{response.content[:200]!r}')
+            if number >= options['warmup']:
+                latencies.append(elapsed)
+                queries.append(len(context.captured_queries))
+        return summarize(latencies, queries, sum(latencies))
+
+    def difference(self, name, stats, baseline):
+        if baseline is None or name not in baseline['scenarios']:
+            return ''
+        before = baseline['scenarios'][name]
+        return (f' (rps {stats["rps"] / before["rps"] - 1:+.1%}, '
+                f'p95 {stats["p95_ms"] / before["p95_ms"] - 1:+.1%})')
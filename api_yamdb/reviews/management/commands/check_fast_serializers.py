@@ -0,0 +1,78 @@
+import time
+
+from django.core.management import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from api.fast_serializers import (FastCommentSerializer, FastReviewSerializer,
+                                  FastTitleSerializer)
+from api.serializers import (CommentSerializer, ReviewSerializer,
+                             TitleReadSerializer)
+from api.views import TitleViewSet
+from reviews.models import Comment, Review
+
+# Имя: (queryset вьюсета, обычный сериализатор, быстрый сериализатор).
+SERIALIZERS = {
+    'titles': (lambda: TitleViewSet.queryset, TitleReadSerializer,
+               FastTitleSerializer),
+    'reviews': (lambda: Review.objects.select_related('author').order_by(
+        '-pub_date', '-id'), ReviewSerializer, FastReviewSerializer),
+    'comments': (lambda: Comment.objects.select_related('author').order_by(
+        '-pub_date', '-id'), CommentSerializer, FastCommentSerializer),
+}
+
+
+def measure(serialize, repeat):
+    """Возвращает результат и наименьшее процессорное время из repeat
+    прогонов (чтение из БД входит в замер)."""
+    best = None
+    for _ in range(repeat):
+        started = time.process_time()
+        data = serialize()
+        elapsed = time.process_time() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return data, best
+
+
+class Command(BaseCommand):
+    help = ("Checks that fast list serializers render the same JSON as "
+            "the regular ones and measures the CPU time they save")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, default=1000,
+            help='Number of rows serialized by each serializer',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Number of timed runs, the fastest one is reported',
+        )
+
+    def handle(self, *args, **options):
+        renderer = JSONRenderer()
+        rows, failed = options['rows'], []
+        for name, (queryset, regular, fast) in SERIALIZERS.items():
+            queryset = queryset()[:rows]
+            expected, regular_time = measure(
+                lambda: regular(list(queryset.all()), many=True).data,
+                options['repeat'])
+            serializer = fast()
+            actual, fast_time = measure(
+                lambda: serializer.serialize(serializer.rows(queryset.all())),
+                options['repeat'])
+            if not expected:
+                raise CommandError(f'No {name} to compare, run load_data '
+                                   'or generate_data first')
+            if renderer.render(expected) != renderer.render(actual):
+                failed.append(name)
+                self.stdout.write(f'{name}: output differs')
+                continue
+            scale = 1000 / len(expected)
+            self.stdout.write(
+                f'{name}: {len(expected)} rows match; per 1000 rows '
+                f'{regular_time * scale * 1000:.1f} ms CPU regular, '
+                f'{fast_time * scale * 1000:.1f} ms fast '
+                f'({regular_time / fast_time:.1f}x)'
+            )
+        if failed:
+            raise CommandError(
+                f'Fast serializers differ: {", ".join(failed)}')
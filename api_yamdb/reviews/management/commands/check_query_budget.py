@@ -0,0 +1,59 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.cache import LRUCacheBackend, response_cache
+from reviews.models import Review
+
+# Максимальное число SQL-запросов на один запрос к эндпоинту.
+# Бюджет не должен зависеть от размера страницы. Один запрос в каждом
+# бюджете — чтение версий коллекции для ETag.
+QUERY_BUDGETS = {
+    'titles-list': ('/api/v1/titles/', 4),
+    'titles-detail': ('/api/v1/titles/{title_id}/', 3),
+    'genres-list': ('/api/v1/genres/', 3),
+    'categories-list': ('/api/v1/categories/', 3),
+    'reviews-list': ('/api/v1/titles/{title_id}/reviews/', 4),
+    'reviews-cursor': (
+        '/api/v1/titles/{title_id}/reviews/?pagination=cursor', 3),
+    'comments-list': (
+        '/api/v1/titles/{title_id}/reviews/{review_id}/comments/', 4),
+}
+
+
+def count_queries(client, url):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    return response, len(context.captured_queries)
+
+
+class Command(BaseCommand):
+    help = "Checks that API endpoints stay within their SQL query budget"
+
+    def handle(self, *args, **options):
+        review = Review.objects.filter(
+            comments__isnull=False).order_by('id').first()
+        if review is None:
+            raise CommandError(
+                'No commented reviews to check, run load_data first')
+
+        # Кэш ответов скрыл бы запросы к БД, поэтому проверка идёт
+        # с пустым кэшем этого процесса.
+        response_cache.backend = LRUCacheBackend()
+        client = APIClient()
+        failed = []
+        for name, (url, budget) in QUERY_BUDGETS.items():
+            url = url.format(title_id=review.title_id, review_id=review.pk)
+            response, queries = count_queries(client, url)
+            if response.status_code != 200:
+                failed.append(name)
+                self.stdout.write(
+                    f'{name}: {url} returned {response.status_code}')
+                continue
+            self.stdout.write(f'{name}: {queries}/{budget} queries')
+            if queries > budget:
+                failed.append(name)
+        if failed:
+            raise CommandError(
+                f'Query budget exceeded: {", ".join(failed)}')
@@ -0,0 +1,113 @@
+import re
+from urllib.parse import quote
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from reviews.models import Review, User
+
+# Эндпоинт: (URL, таблицы, полный просмотр которых ожидаем). Списки
+# без фильтров читают таблицу целиком постранично, это не ошибка.
+ENDPOINTS = {
+    'titles-list': ('/api/v1/titles/', {'reviews_title'}),
+    'titles-year': ('/api/v1/titles/?year={year}', set()),
+    'titles-name': ('/api/v1/titles/?name={name}', set()),
+    'title-detail': ('/api/v1/titles/{title_id}/', set()),
+    'genres-list': ('/api/v1/genres/', {'reviews_genre'}),
+    'categories-list': ('/api/v1/categories/', {'reviews_category'}),
+    'reviews-list': ('/api/v1/titles/{title_id}/reviews/', set()),
+    'reviews-cursor': (
+        '/api/v1/titles/{title_id}/reviews/?pagination=cursor', set()),
+    'comments-list': (
+        '/api/v1/titles/{title_id}/reviews/{review_id}/comments/', set()),
+    'users-list': ('/api/v1/users/', {'users_user'}),
+}
+# Таблицы из нескольких строк, их просмотр дешевле поиска по индексу.
+# Категорий десятки: список произведений проверяет, не скрыты ли они.
+SMALL_TABLES = {'api_collectionversion', 'reviews_category'}
+# Строки плана с полным просмотром таблицы: SQLite и PostgreSQL.
+FULL_SCAN = re.compile(r'^SCAN (\w+)$|Seq Scan on (\w+)')
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}')
+        return [' '.join(str(column) for column in row[3:] or row)
+                for row in cursor.fetchall()]
+
+
+def plan_scans(plan):
+    return {name for line in plan
+            for match in [FULL_SCAN.search(line.strip())] if match
+            for name in match.groups() if name}
+
+
+class Command(BaseCommand):
+    help = ("Runs EXPLAIN on the queries of API endpoints and flags "
+            "full table scans")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help='Collect table statistics for the planner first',
+        )
+        parser.add_argument(
+            '--plans', action='store_true',
+            help='Print the plan of every query',
+        )
+
+    def handle(self, *args, **options):
+        review = Review.objects.filter(
+            comments__isnull=False).select_related('title').order_by(
+            'id').first()
+        if review is None:
+            raise CommandError(
+                'No commented reviews to check, run load_data first')
+        if options['analyze']:
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        flagged = []
+        # Администратор нужен для списка пользователей и откатывается.
+        with transaction.atomic():
+            admin = User.objects.create(username='explain_queries',
+                                        email='explain@example.com',
+                                        role='admin')
+            client = APIClient()
+            client.force_authenticate(admin)
+            for name, (url, expected) in ENDPOINTS.items():
+                url = url.format(
+                    title_id=review.title_id, review_id=review.pk,
+                    year=review.title.year, name=quote(review.title.name))
+                scans = self.full_scans(
+                    client, name, url, options['plans']
+                ) - expected - SMALL_TABLES
+                if scans:
+                    flagged.append(name)
+                    self.stdout.write(
+                        f'{name}: full scan of {", ".join(sorted(scans))}')
+                else:
+                    self.stdout.write(f'{name}: ok')
+            transaction.set_rollback(True)
+        if flagged:
+            raise CommandError(f'Full table scans: {", ".join(flagged)}')
+
+    def full_scans(self, client, name, url, show_plans):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        if response.status_code != 200:
+            raise CommandError(
+                f'{name}: {url} returned {response.status_code}')
+        scans = set()
+        for query in context.captured_queries:
+            if not query['sql'].lstrip().upper().startswith('SELECT'):
+                continue
+            plan = explain(query['sql'])
+            scans |= plan_scans(plan)
+            if show_plans:
+                self.stdout.write(f'{name}: {query["sql"]}')
+                for line in plan:
+                    self.stdout.write(f'    {line}')
+        return scans
@@ -0,0 +1,45 @@
+import gzip
+import os
+import time
+
+from django.core.management import BaseCommand
+
+from reviews.export import EXPORTS, FORMATS, export_chunks, file_name
+
+
+class Command(BaseCommand):
+    help = "Streams titles, reviews and comments to NDJSON or CSV files"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--kind', dest='kinds', action='append', choices=list(EXPORTS),
+            help='What to export, can be repeated (default: everything)',
+        )
+        parser.add_argument('--output', default='export',
+                            help='Directory for the exported files')
+        parser.add_argument('--format', default='csv', choices=FORMATS)
+        parser.add_argument('--gzip', action='store_true',
+                            help='Compress the files with gzip')
+        parser.add_argument(
+            '--after', type=int, default=0,
+            help='Resume after this id and append to the existing files',
+        )
+
+    def handle(self, *args, **options):
+        fmt, compressed, after = (options['format'], options['gzip'],
+                                  options['after'])
+        os.makedirs(options['output'], exist_ok=True)
+        for kind in options['kinds'] or EXPORTS:
+            path = os.path.join(options['output'],
+                                file_name(kind, fmt, compressed))
+            # При продолжении строки дописываются к файлу без заголовка.
+            append = after > 0 and os.path.exists(path)
+            opener = gzip.open if compressed else open
+            started = time.perf_counter()
+            with opener(path, 'at' if append else 'wt', encoding='utf-8',
+                        newline='') as file:
+                for chunk in export_chunks(kind, fmt, after,
+                                           header=not append):
+                    file.write(chunk)
+            self.stdout.write(
+                f'{path}: {time.perf_counter() - started:.2f}s')
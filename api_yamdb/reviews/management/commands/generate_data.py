@@ -0,0 +1,119 @@
+import csv
+import os
+import random
+from datetime import datetime, timedelta, timezone
+
+from django.core.management import BaseCommand, CommandError
+
+from users.constants import ADMIN, MODER, USER
+
+WORDS = (
+    'фильм книга музыка сюжет герой финал актёр автор режиссёр глава '
+    'песня альбом жанр сцена диалог смысл история эпизод образ стиль '
+    'отлично скучно сильно слабо красиво неожиданно честно долго ярко'
+).split()
+START_DATE = datetime(2015, 1, 1, tzinfo=timezone.utc)
+
+
+def text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def pub_date(rng):
+    moment = START_DATE + timedelta(milliseconds=rng.randrange(10 ** 11))
+    return f'{moment:%Y-%m-%dT%H:%M:%S}.{moment.microsecond // 1000:03d}Z'
+
+
+def write_csv(path, header, rows):
+    with open(path, 'w', encoding='utf-8', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+class Command(BaseCommand):
+    help = "Generates synthetic CSV files in the layout load_data consumes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='bench_data',
+                            help='Directory for the generated files')
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--genres', type=int, default=30)
+        parser.add_argument('--titles', type=int, default=10000)
+        parser.add_argument('--reviews', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=200000)
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Seed making the dataset reproducible')
+
+    def handle(self, *args, **options):
+        users, titles = options['users'], options['titles']
+        per_title = -(-options['reviews'] // titles) if titles else 0
+        if per_title > users:
+            raise CommandError(
+                'A user can review a title only once: --reviews must not '
+                'exceed --titles * --users')
+        rng = random.Random(options['seed'])
+        output = options['output']
+        os.makedirs(output, exist_ok=True)
+
+        write_csv(
+            os.path.join(output, 'users.csv'),
+            ('id', 'username', 'email', 'role', 'bio', 'first_name',
+             'last_name'),
+            ((pk, f'user{pk}', f'user{pk}@example.com',
+              ADMIN if pk == 1 else rng.choice((USER,) * 8 + (MODER,)),
+              '', '', '') for pk in range(1, users + 1)),
+        )
+        write_csv(
+            os.path.join(output, 'category.csv'), ('id', 'name', 'slug'),
+            ((pk, f'Категория {pk}', f'category{pk}')
+             for pk in range(1, options['categories'] + 1)),
+        )
+        write_csv(
+            os.path.join(output, 'genre.csv'), ('id', 'name', 'slug'),
+            ((pk, f'Жанр {pk}', f'genre{pk}')
+             for pk in range(1, options['genres'] + 1)),
+        )
+        write_csv(
+            os.path.join(output, 'titles.csv'),
+            ('id', 'name', 'year', 'category_id'),
+            ((pk, text(rng, 3), rng.randint(1900, 2023),
+              rng.randint(1, options['categories']))
+             for pk in range(1, titles + 1)),
+        )
+        write_csv(
+            os.path.join(output, 'genre_title.csv'),
+            ('id', 'title_id', 'genre_id'),
+            self.genre_titles(rng, titles, options['genres']),
+        )
+        write_csv(
+            os.path.join(output, 'review.csv'),
+            ('id', 'title_id', 'text', 'author_id', 'score', 'pub_date'),
+            self.reviews(rng, options['reviews'], titles, users, per_title),
+        )
+        write_csv(
+            os.path.join(output, 'comments.csv'),
+            ('id', 'review_id', 'text', 'author_id', 'pub_date'),
+            ((pk, rng.randint(1, options['reviews']), text(rng, 8),
+              rng.randint(1, users), pub_date(rng))
+             for pk in range(1, options['comments'] + 1)),
+        )
+        self.stdout.write(f'Dataset is written to {output}')
+
+    def genre_titles(self, rng, titles, genres):
+        pk = 0
+        for title_id in range(1, titles + 1):
+            for genre_id in rng.sample(range(1, genres + 1),
+                                       min(genres, rng.randint(1, 3))):
+                pk += 1
+                yield pk, title_id, genre_id
+
+    def reviews(self, rng, count, titles, users, per_title):
+        """Отзывы распределяются по произведениям поровну, авторы одного
+        произведения различны (ограничение unique_title_author)."""
+        for pk in range(1, count + 1):
+            title_id, slot = (pk - 1) % titles + 1, (pk - 1) // titles
+            author_id = (title_id * per_title + slot) % users + 1
+            yield (pk, title_id, text(rng, 20), author_id,
+                   rng.randint(1, 10), pub_date(rng))
@@ -1,9 +1,19 @@
-import csv
+import os
+import time
+from datetime import timedelta
 
 from django.core.management import BaseCommand
+from django.db import connection, transaction
 
+from api.cache import mark_changed
+from api.models import ALL_COLLECTIONS
+from reviews.importer import (DEFAULT_BATCH_SIZE, load_files,
+                              record_fingerprints, sync_files, truncate)
+from reviews.leaderboards import mark_dirty, refresh_stale
 from reviews.models import (Title, Genre, Category, User,
-                            Review, Comment)
+                            Review, Comment, RowFingerprint)
+from reviews.search import search_backend
+from reviews.utils import rebuild_comment_counts, rebuild_title_ratings
 
 ALREDY_LOADED_ERROR_MESSAGE = """
 If you need to reload the child data from the CSV file,
@@ -17,24 +27,168 @@ FILES = [
 MODELS = [User, Category, Genre, Title, Review, Comment, Title.genre.through]
 
 
-def import_csv(file, model):
-    with open(file, encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        print(file)
-        for row in reader:
-            model.objects.create(**row)
-
-
 class Command(BaseCommand):
     help = "Loads data from somefiles.csv"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', default='static/data',
+            help='Directory with the CSV files',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Number of rows inserted per transaction',
+        )
+        mode = parser.add_mutually_exclusive_group()
+        mode.add_argument(
+            '--truncate', dest='append', action='store_false',
+            help='Delete existing data before loading (default)',
+        )
+        mode.add_argument(
+            '--append', dest='append', action='store_true',
+            help='Keep existing data and add rows from the files',
+        )
+        mode.add_argument(
+            '--sync', action='store_true',
+            help='Apply only inserts, updates and deletes since last sync',
+        )
+        parser.set_defaults(append=False)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Read and check the files, then roll everything back',
+        )
+        parser.add_argument(
+            '--jobs', type=int, default=1,
+            help='Number of worker processes parsing files in parallel',
+        )
+
     def handle(self, *args, **options):
-        for model in MODELS:
-            if model.objects.exists():
-                print(model, ' data already loaded....')
-                print("Deleting data")
-                model.objects.all().delete()
-                print("Data is deleted")
-        print("Loading data")
-        for file, model in zip(FILES, MODELS):
-            import_csv(f'static/data/{file}', model)
+        if not options['dry_run']:
+            self.load(**options)
+            return
+        with transaction.atomic():
+            self.load(**options)
+            transaction.set_rollback(True)
+        self.stdout.write('Dry run, changes are rolled back')
+
+    def load(self, path, batch_size, append, dry_run, jobs, sync,
+             **options):
+        if sync:
+            self.sync(path, batch_size)
+            return
+        stages = {}
+        if not append:
+            self.stdout.write('Deleting data')
+            started = time.perf_counter()
+            truncate(MODELS + [RowFingerprint])
+            stages['truncate'] = time.perf_counter() - started
+
+        self.stdout.write('Loading data')
+        started = time.perf_counter()
+        # SQLite блокирует базу целиком на запись, а пробный прогон
+        # должен идти в одной транзакции, поэтому тогда пишет один поток.
+        results = load_files(
+            [(os.path.join(path, file), model)
+             for file, model in zip(FILES, MODELS)],
+            batch_size=batch_size, jobs=jobs,
+            concurrent_writes=not dry_run and connection.vendor != 'sqlite',
+        )
+        stages['load'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        record_fingerprints(
+            [(os.path.join(path, file), model)
+             for file, model in zip(FILES, MODELS)],
+            batch_size=batch_size,
+        )
+        stages['fingerprints'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        rebuild_title_ratings()
+        rebuild_comment_counts()
+        mark_changed(ALL_COLLECTIONS)
+        stages['ratings'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        mark_dirty()
+        refresh_stale(timedelta(0))
+        stages['leaderboards'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        search_backend.rebuild()
+        stages['search index'] = time.perf_counter() - started
+
+        for file in FILES:
+            stats = results[os.path.join(path, file)]
+            elapsed = stats['read'] + stats['write']
+            self.stdout.write(
+                f'{file}: {stats["rows"]} rows in {elapsed:.2f}s '
+                f'({stats["rows"] / elapsed if elapsed else 0:.0f} rows/s), '
+                f'{stats["skipped"]} skipped; parse {stats["parse"]:.2f}s, '
+                f'wait {stats["read"]:.2f}s, write {stats["write"]:.2f}s'
+            )
+        self.stdout.write(', '.join(
+            f'{stage} {seconds:.2f}s' for stage, seconds in stages.items()))
+
+    def sync(self, path, batch_size):
+        self.stdout.write('Syncing data')
+        started = time.perf_counter()
+        results = sync_files(
+            [(os.path.join(path, file), model)
+             for file, model in zip(FILES, MODELS)],
+            batch_size=batch_size,
+        )
+        stages = {'sync': time.perf_counter() - started}
+        by_model = dict(zip(MODELS, (results[os.path.join(path, file)]
+                                     for file in FILES)))
+        changed = {model for model, stats in by_model.items()
+                   if stats['written'] or stats['deleted']}
+
+        started = time.perf_counter()
+        # Удалённые отзывы и комментарии уже вычтены сигналами,
+        # пересчитываются произведения записанных отзывов и отзывы
+        # записанных комментариев (прежние и новые).
+        title_ids = sorted(by_model[Review]['related'].get('title_id', ()))
+        for start in range(0, len(title_ids), batch_size):
+            rebuild_title_ratings(title_ids[start:start + batch_size])
+        review_ids = sorted(
+            by_model[Comment]['related'].get('review_id', ()))
+        for start in range(0, len(review_ids), batch_size):
+            rebuild_comment_counts(review_ids[start:start + batch_size])
+        if changed:
+            mark_changed(ALL_COLLECTIONS)
+        if changed & {Title, Review, Title.genre.through}:
+            mark_dirty()
+        stages['ratings'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        # Крупные изменения дешевле переиндексировать целиком.
+        if sum(len(by_model[model]['written'])
+               for model in (Title, Review, Comment)) > batch_size:
+            search_backend.rebuild()
+        else:
+            self.index(by_model, batch_size)
+        stages['search index'] = time.perf_counter() - started
+
+        for file in FILES:
+            stats = results[os.path.join(path, file)]
+            self.stdout.write(
+                f'{file}: {stats["inserted"]} inserted, '
+                f'{stats["updated"]} updated, {stats["deleted"]} deleted, '
+                f'{stats["unchanged"]} unchanged, {stats["skipped"]} '
+                f'skipped; diff {stats["diff"]:.2f}s, '
+                f'write {stats["write"]:.2f}s'
+            )
+        self.stdout.write(', '.join(
+            f'{stage} {seconds:.2f}s' for stage, seconds in stages.items()))
+
+    def index(self, by_model, batch_size):
+        for model in (Title, Review, Comment):
+            written = sorted(by_model[model]['written'])
+            for start in range(0, len(written), batch_size):
+                objects = model.objects.filter(
+                    pk__in=written[start:start + batch_size])
+                if model is Comment:
+                    objects = objects.select_related('review')
+                for instance in objects:
+                    search_backend.index(instance)
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management import BaseCommand
+
+from reviews.purge import DEFAULT_BATCH_SIZE, next_job, purge_batch, start
+
+
+class Command(BaseCommand):
+    help = ("Purges soft-deleted titles, categories and users "
+            "in small batches")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Number of rows deleted per transaction',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5,
+            help='Seconds to wait when there is nothing to purge',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit when there is nothing left to purge',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            job = next_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
+                continue
+            start(job)
+            self.stdout.write(f'Purging {job.model} {job.object_repr}: '
+                              f'{job.total} rows')
+            while purge_batch(job, options['batch_size']):
+                pass
+            job.refresh_from_db()
+            self.stdout.write(f'Purged {job.model} {job.object_repr}: '
+                              f'{job.deleted} rows')
@@ -0,0 +1,34 @@
+from django.core.management import BaseCommand, CommandError
+
+from api.cache import mark_changed
+from reviews.leaderboards import mark_dirty
+from reviews.utils import rebuild_title_ratings, titles_with_rating_drift
+
+
+class Command(BaseCommand):
+    help = "Rebuilds stored title ratings from reviews"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report titles whose stored rating has drifted',
+        )
+
+    def handle(self, *args, **options):
+        drifted = titles_with_rating_drift()
+        for title in drifted.iterator():
+            self.stdout.write(
+                f'Title {title.pk}: stored {title.score_sum}/'
+                f'{title.review_count}, actual {title.actual_score_sum}/'
+                f'{title.actual_review_count}'
+            )
+        if options['check']:
+            count = drifted.count()
+            if count:
+                raise CommandError(f'{count} titles have drifted')
+            self.stdout.write('Ratings are consistent')
+            return
+        updated = rebuild_title_ratings()
+        mark_changed('titles')
+        mark_dirty()
+        self.stdout.write(f'Rebuilt ratings for {updated} titles')
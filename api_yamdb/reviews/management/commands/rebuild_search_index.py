@@ -0,0 +1,14 @@
+from django.core.management import BaseCommand
+
+from reviews.search import search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the full-text search index"
+
+    def handle(self, *args, **options):
+        if not search_backend.available():
+            self.stderr.write('Search index is not available on this database')
+            return
+        search_backend.rebuild()
+        self.stdout.write('Search index is rebuilt')
@@ -0,0 +1,47 @@
+from django.core.management import BaseCommand, CommandError
+
+from api.cache import mark_changed
+from api.models import ALL_COLLECTIONS
+from reviews.leaderboards import mark_dirty
+from reviews.utils import (rebuild_comment_counts, rebuild_title_ratings,
+                           reviews_with_comment_count_drift,
+                           titles_with_rating_drift)
+
+
+class Command(BaseCommand):
+    help = ("Fixes drifted review counts of titles and comment counts "
+            "of reviews, e.g. after bulk imports")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report counters that have drifted',
+        )
+
+    def handle(self, *args, **options):
+        titles = list(titles_with_rating_drift().values_list(
+            'pk', 'review_count', 'actual_review_count'))
+        reviews = list(reviews_with_comment_count_drift().values_list(
+            'pk', 'comment_count', 'actual_comment_count'))
+        for pk, stored, actual in titles:
+            self.stdout.write(f'Title {pk}: stored {stored} reviews, '
+                              f'actual {actual}')
+        for pk, stored, actual in reviews:
+            self.stdout.write(f'Review {pk}: stored {stored} comments, '
+                              f'actual {actual}')
+        if options['check']:
+            if titles or reviews:
+                raise CommandError(f'{len(titles)} titles and '
+                                   f'{len(reviews)} reviews have drifted')
+            self.stdout.write('Counters are consistent')
+            return
+        # Пересчитываются только разошедшиеся записи.
+        if titles:
+            rebuild_title_ratings([pk for pk, _, _ in titles])
+            mark_dirty()
+        if reviews:
+            rebuild_comment_counts([pk for pk, _, _ in reviews])
+        if titles or reviews:
+            mark_changed(ALL_COLLECTIONS)
+        self.stdout.write(f'Fixed {len(titles)} titles and '
+                          f'{len(reviews)} reviews')
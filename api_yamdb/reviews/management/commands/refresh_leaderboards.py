@@ -0,0 +1,33 @@
+import time
+from datetime import timedelta
+
+from django.core.management import BaseCommand
+
+from reviews.leaderboards import refresh_stale
+
+
+class Command(BaseCommand):
+    help = "Refreshes leaderboards changed since their last refresh"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=10,
+            help='Seconds between refreshes',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Refresh once and exit',
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            # Топы, которые ждут дольше интервала, пересчитываются
+            # здесь, и читателям не приходится делать это самим.
+            refreshed = refresh_stale(
+                timedelta(0 if options['once'] else interval))
+            if refreshed:
+                self.stdout.write(f'Refreshed {refreshed} leaderboards')
+            if options['once']:
+                return
+            time.sleep(interval)
@@ -0,0 +1,41 @@
+# Generated by Django 3.2 on 2026-10-17 20:36
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_title_ratings(apps, schema_editor):
+    Title = apps.get_model('reviews', 'Title')
+    Review = apps.get_model('reviews', 'Review')
+
+    def aggregate(expression):
+        return Coalesce(Subquery(
+            Review.objects.filter(title=OuterRef('pk'))
+            .order_by().values('title')
+            .annotate(value=expression).values('value')
+        ), 0)
+
+    Title.objects.update(score_sum=aggregate(Sum('score')),
+                         review_count=aggregate(Count('pk')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='title',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='review count'),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='score_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='score sum'),
+        ),
+        migrations.RunPython(fill_title_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+from django.db import migrations
+
+CREATE_INDEX = """
+CREATE VIRTUAL TABLE reviews_search_index USING fts5(
+    kind UNINDEXED, object_id UNINDEXED, title_id UNINDEXED,
+    review_id UNINDEXED, body,
+    tokenize = 'unicode61', prefix = '2 3'
+)
+"""
+FILL_INDEX = [
+    """
+    INSERT INTO reviews_search_index
+        (rowid, kind, object_id, title_id, review_id, body)
+    SELECT id * 4 + 1, 'title', id, id, NULL,
+           name || char(10) || coalesce(description, '')
+    FROM reviews_title
+    """,
+    """
+    INSERT INTO reviews_search_index
+        (rowid, kind, object_id, title_id, review_id, body)
+    SELECT id * 4 + 2, 'review', id, title_id, id, text FROM reviews_review
+    """,
+    """
+    INSERT INTO reviews_search_index
+        (rowid, kind, object_id, title_id, review_id, body)
+    SELECT c.id * 4 + 3, 'comment', c.id, r.title_id, c.review_id, c.text
+    FROM reviews_comment c JOIN reviews_review r ON r.id = c.review_id
+    """,
+]
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE_INDEX)
+    for sql in FILL_INDEX:
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE reviews_search_index')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0004_pub_date_cursor_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 3.2 on 2026-10-17 20:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0006_title_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Leaderboard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('top-rated', 'Лучшие по оценке'), ('most-reviewed', 'Больше всего отзывов'), ('trending', 'В тренде')], max_length=20)),
+                ('scope', models.CharField(blank=True, max_length=64)),
+                ('refreshed_at', models.DateTimeField()),
+                ('dirty_since', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Рейтинг',
+                'verbose_name_plural': 'Рейтинги',
+            },
+        ),
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('value', models.IntegerField()),
+            ],
+            options={
+                'verbose_name': 'Место в рейтинге',
+                'verbose_name_plural': 'Места в рейтинге',
+                'ordering': ['position'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['pub_date', 'title'], name='review_pub_date_title_idx'),
+        ),
+        migrations.AddField(
+            model_name='leaderboardentry',
+            name='leaderboard',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='reviews.leaderboard'),
+        ),
+        migrations.AddField(
+            model_name='leaderboardentry',
+            name='title',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='reviews.title'),
+        ),
+        migrations.AddConstraint(
+            model_name='leaderboard',
+            constraint=models.UniqueConstraint(fields=('kind', 'scope'), name='unique_leaderboard_kind_scope'),
+        ),
+        migrations.AddConstraint(
+            model_name='leaderboardentry',
+            constraint=models.UniqueConstraint(fields=('leaderboard', 'position'), name='unique_leaderboard_position'),
+        ),
+    ]
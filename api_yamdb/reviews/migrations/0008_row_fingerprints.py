@@ -0,0 +1,30 @@
+# Generated by Django 3.2 on 2026-10-17 21:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0007_leaderboards'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RowFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(max_length=64)),
+                ('row_id', models.BigIntegerField()),
+                ('digest', models.CharField(max_length=40)),
+            ],
+            options={
+                'verbose_name': 'Отпечаток строки',
+                'verbose_name_plural': 'Отпечатки строк',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='rowfingerprint',
+            constraint=models.UniqueConstraint(fields=('table', 'row_id'), name='unique_row_fingerprint'),
+        ),
+    ]
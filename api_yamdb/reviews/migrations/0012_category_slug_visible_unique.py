@@ -0,0 +1,23 @@
+# Generated by Django 3.2 on 2026-10-17 21:46
+
+from django.db import migrations, models
+import reviews.validators
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0011_title_deleted_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='category',
+            name='slug',
+            field=models.SlugField(db_index=False, validators=[reviews.validators.validate_alphanumeric], verbose_name='slug'),
+        ),
+        migrations.AddConstraint(
+            model_name='category',
+            constraint=models.UniqueConstraint(condition=models.Q(deleted_at__isnull=True), fields=('slug',), name='unique_visible_category_slug'),
+        ),
+    ]
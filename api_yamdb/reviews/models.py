@@ -6,6 +6,48 @@ from .validators import validate_alphanumeric, score_validator, validate_year
 User = get_user_model()
 
 
+class CounterFieldsMixin:
+    """Счётчики из counter_fields меняются только атомарными update с F().
+    Обычное сохранение существующего объекта их не пишет, чтобы не
+    затереть изменения, сделанные параллельно."""
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and not kwargs.get('force_insert')
+                and kwargs.get('update_fields') is None):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+# Мягко удалённые записи (см. reviews/purge.py) и всё, что от них
+# зависит, скрыты до очистки: отдельные записи и поиск, счётчики и
+# рейтинги строятся только по видимым.
+class TitleQuerySet(models.QuerySet):
+    def visible(self):
+        return self.filter(deleted_at__isnull=True,
+                           category__deleted_at__isnull=True)
+
+
+class ReviewQuerySet(models.QuerySet):
+    def visible(self):
+        return self.filter(title__deleted_at__isnull=True,
+                           title__category__deleted_at__isnull=True,
+                           author__deleted_at__isnull=True)
+
+
+class CommentQuerySet(models.QuerySet):
+    def visible(self):
+        return self.filter(review__title__deleted_at__isnull=True,
+                           review__title__category__deleted_at__isnull=True,
+                           review__author__deleted_at__isnull=True,
+                           author__deleted_at__isnull=True)
+
+
 class Genre(models.Model):
     name = models.TextField(max_length=256, verbose_name='slug')
     slug = models.SlugField(
@@ -22,42 +64,78 @@ class Genre(models.Model):
         return self.slug
 
 
-class Title(models.Model):
+class Title(CounterFieldsMixin, models.Model):
     name = models.TextField(max_length=256, verbose_name='name')
     year = models.IntegerField(verbose_name='year', validators=[validate_year])
     genre = models.ManyToManyField(Genre, verbose_name='genre')
     category = models.ForeignKey('Category', on_delete=models.CASCADE,
-                                 related_name='titles',
+                                 related_name='titles', db_index=False,
                                  verbose_name='category')
     description = models.TextField(default='', null=True, blank=True,
                                    verbose_name='description')
+    score_sum = models.PositiveIntegerField(default=0, editable=False,
+                                            verbose_name='score sum')
+    review_count = models.PositiveIntegerField(default=0, editable=False,
+                                               verbose_name='review count')
+    # Время мягкого удаления: произведение скрыто, а удаляет его вместе
+    # с отзывами порциями команда purge_deleted.
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = TitleQuerySet.as_manager()
+
+    counter_fields = ('score_sum', 'review_count')
 
     class Meta:
         verbose_name = 'произведение'
         verbose_name_plural = 'произведения'
         ordering = ['id']
+        # Фильтры списка произведений с сортировкой по id. Индекс по
+        # категории заменяет обычный индекс внешнего ключа.
+        indexes = [
+            models.Index(fields=['year', 'id'], name='title_year_id_idx'),
+            models.Index(fields=['name', 'id'], name='title_name_id_idx'),
+            models.Index(fields=['category', 'id'],
+                         name='title_category_id_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    @property
+    def rating(self):
+        """Средняя оценка по сохранённым сумме и количеству отзывов."""
+        if not self.review_count:
+            return None
+        return self.score_sum // self.review_count
+
 
 class Category(models.Model):
     name = models.TextField(max_length=256, verbose_name='name')
     slug = models.SlugField(
         max_length=50, validators=(validate_alphanumeric,),
-        unique=True,
+        db_index=False,
         verbose_name='slug'
     )
+    # Время мягкого удаления: категория и её произведения скрыты, а
+    # удаляет их порциями команда purge_deleted.
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     class Meta:
         verbose_name = 'Категория'
         verbose_name_plural = 'Категории'
+        # Slug уникален среди видимых категорий: мягко удалённая
+        # категория не мешает сразу создать новую с тем же slug.
+        constraints = [
+            models.UniqueConstraint(
+                fields=['slug'], condition=models.Q(deleted_at__isnull=True),
+                name='unique_visible_category_slug')
+        ]
 
     def __str__(self):
         return self.slug
 
 
-class Review(models.Model):
+class Review(CounterFieldsMixin, models.Model):
     title = models.ForeignKey(Title, related_name='reviews',
                               on_delete=models.CASCADE)
     author = models.ForeignKey(User, related_name='reviews',
@@ -65,6 +143,12 @@ class Review(models.Model):
     text = models.TextField()
     score = models.IntegerField(validators=(score_validator,))
     pub_date = models.DateTimeField(auto_now_add=True)
+    comment_count = models.PositiveIntegerField(default=0, editable=False,
+                                                verbose_name='comment count')
+
+    objects = ReviewQuerySet.as_manager()
+
+    counter_fields = ('comment_count',)
 
     class Meta:
         verbose_name = 'Отзыв'
@@ -75,6 +159,13 @@ class Review(models.Model):
                 fields=['title', 'author'], name='unique_title_author'
             )
         ]
+        indexes = [
+            models.Index(fields=['title', 'pub_date', 'id'],
+                         name='review_title_pub_date_idx'),
+            # Подсчёт свежих отзывов для рейтинга «в тренде».
+            models.Index(fields=['pub_date', 'title'],
+                         name='review_pub_date_title_idx'),
+        ]
 
 
 class Comment(models.Model):
@@ -85,7 +176,117 @@ class Comment(models.Model):
     text = models.TextField()
     pub_date = models.DateTimeField(auto_now_add=True)
 
+    objects = CommentQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['review', 'pub_date', 'id'],
+                         name='comment_review_pub_date_idx'),
+        ]
+
+
+class Leaderboard(models.Model):
+    """Сохранённый топ произведений одного вида в одной области
+    (весь каталог, категория, жанр или окно «в тренде»)."""
+
+    TOP_RATED = 'top-rated'
+    MOST_REVIEWED = 'most-reviewed'
+    TRENDING = 'trending'
+    KINDS = (
+        (TOP_RATED, 'Лучшие по оценке'),
+        (MOST_REVIEWED, 'Больше всего отзывов'),
+        (TRENDING, 'В тренде'),
+    )
+
+    kind = models.CharField(max_length=20, choices=KINDS)
+    scope = models.CharField(max_length=64, blank=True)
+    refreshed_at = models.DateTimeField()
+    # Время первого изменения отзывов после последнего пересчёта.
+    dirty_since = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Рейтинг'
+        verbose_name_plural = 'Рейтинги'
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'scope'],
+                                    name='unique_leaderboard_kind_scope')
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.scope}'.strip()
+
+
+class LeaderboardEntry(models.Model):
+    leaderboard = models.ForeignKey(Leaderboard, related_name='entries',
+                                    on_delete=models.CASCADE)
+    position = models.PositiveIntegerField()
+    title = models.ForeignKey(Title, related_name='+',
+                              on_delete=models.CASCADE)
+    value = models.IntegerField()
+
+    class Meta:
+        verbose_name = 'Место в рейтинге'
+        verbose_name_plural = 'Места в рейтинге'
+        ordering = ['position']
+        constraints = [
+            models.UniqueConstraint(fields=['leaderboard', 'position'],
+                                    name='unique_leaderboard_position')
+        ]
+
+
+class RowFingerprint(models.Model):
+    """Хэш строки CSV, загруженной `load_data --sync`. По нему следующая
+    синхронизация находит изменённые и удалённые строки."""
+
+    table = models.CharField(max_length=64)
+    row_id = models.BigIntegerField()
+    digest = models.CharField(max_length=40)
+
+    class Meta:
+        verbose_name = 'Отпечаток строки'
+        verbose_name_plural = 'Отпечатки строк'
+        constraints = [
+            models.UniqueConstraint(fields=['table', 'row_id'],
+                                    name='unique_row_fingerprint')
+        ]
+
+
+class PurgeJob(models.Model):
+    """Удаление мягко удалённого объекта вместе с зависимыми записями.
+    Выполняется порциями командой purge_deleted."""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Завершено'),
+    )
+
+    model = models.CharField(max_length=100)
+    object_id = models.BigIntegerField()
+    object_repr = models.CharField(max_length=200)
+    status = models.CharField(max_length=7, choices=STATUSES,
+                              default=PENDING)
+    # Число записей к удалению, считается при запуске задачи.
+    total = models.PositiveIntegerField(null=True, blank=True)
+    deleted = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Очистка'
+        verbose_name_plural = 'Очистки'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'id'],
+                         name='purge_job_status_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.model} {self.object_repr} ({self.status})'
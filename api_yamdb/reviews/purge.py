@@ -0,0 +1,119 @@
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .leaderboards import mark_dirty
+from .models import Category, Comment, PurgeJob, Review, Title, User
+from .search import search_backend
+from .utils import (counters_paused, rebuild_comment_counts,
+                    rebuild_title_ratings)
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def soft_delete(instance):
+    """Скрывает произведение, категорию или пользователя сразу и ставит
+    удаление объекта и зависимых записей в очередь purge_deleted.
+    Скрытые записи сразу убираются из поиска и топов, а отзывы и
+    комментарии пользователя — из счётчиков произведений и отзывов."""
+    instance.deleted_at = timezone.now()
+    fields = ['deleted_at']
+    if isinstance(instance, User):
+        instance.is_active = False
+        fields.append('is_active')
+    with transaction.atomic():
+        instance.save(update_fields=fields)
+        job = PurgeJob.objects.create(
+            model=instance._meta.label_lower, object_id=instance.pk,
+            object_repr=str(instance))
+        if isinstance(instance, Title):
+            search_backend.remove_related(
+                titles=Title.objects.filter(pk=instance.pk))
+        elif isinstance(instance, Category):
+            search_backend.remove_related(
+                titles=Title.objects.filter(category_id=instance.pk))
+        else:
+            reviews = Review.objects.filter(author_id=instance.pk)
+            comments = Comment.objects.filter(author_id=instance.pk)
+            search_backend.remove_related(reviews=reviews, comments=comments)
+            rebuild_title_ratings(Title.objects.filter(
+                pk__in=reviews.values('title_id')))
+            rebuild_comment_counts(Review.objects.filter(
+                pk__in=comments.values('review_id')))
+        mark_dirty()
+    return job
+
+
+def purge_steps(job):
+    """Наборы записей задачи в порядке удаления: от листьев каскада
+    к самому объекту, чтобы каждая порция каскадом задевала только
+    небольшое число записей."""
+    if job.model == Title._meta.label_lower:
+        return [
+            Comment.objects.filter(review__title_id=job.object_id),
+            Review.objects.filter(title_id=job.object_id),
+            Title.objects.filter(pk=job.object_id),
+        ]
+    if job.model == Category._meta.label_lower:
+        return [
+            Comment.objects.filter(review__title__category_id=job.object_id),
+            Review.objects.filter(title__category_id=job.object_id),
+            Title.objects.filter(category_id=job.object_id),
+            Category.objects.filter(pk=job.object_id),
+        ]
+    if job.model == User._meta.label_lower:
+        return [
+            Comment.objects.filter(author_id=job.object_id),
+            Comment.objects.filter(review__author_id=job.object_id)
+            .exclude(author_id=job.object_id),
+            Review.objects.filter(author_id=job.object_id),
+            User.objects.filter(pk=job.object_id),
+        ]
+    raise ValueError(f'Cannot purge {job.model}')
+
+
+def start(job):
+    """Отмечает задачу запущенной и считает, сколько записей удалить."""
+    if job.total is None:
+        job.total = sum(queryset.count() for queryset in purge_steps(job))
+    job.status = PurgeJob.RUNNING
+    job.started_at = job.started_at or timezone.now()
+    job.save(update_fields=['total', 'status', 'started_at'])
+    return job
+
+
+def purge_batch(job, batch_size=DEFAULT_BATCH_SIZE):
+    """Удаляет очередную порцию записей задачи в отдельной транзакции.
+    Удаление идёт через ORM, поэтому сигналы обновляют рейтинги, поиск
+    и кэш. Записи скрытого пользователя уже вычтены из счётчиков при
+    мягком удалении, поэтому сигналы их не сдвигают, а счётчики
+    затронутых произведений и отзывов после удаления пересчитываются.
+    Возвращает число удалённых записей, 0 — задача выполнена."""
+    for queryset in purge_steps(job):
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True)
+                   [:batch_size])
+        if not ids:
+            continue
+        objects = queryset.model.objects.filter(pk__in=ids)
+        with transaction.atomic(), counters_paused():
+            if queryset.model is Review:
+                title_ids = set(objects.values_list('title_id', flat=True))
+            elif queryset.model is Comment:
+                review_ids = set(objects.values_list('review_id',
+                                                     flat=True))
+            objects.delete()
+            if queryset.model is Review:
+                rebuild_title_ratings(title_ids)
+            elif queryset.model is Comment:
+                rebuild_comment_counts(review_ids)
+            PurgeJob.objects.filter(pk=job.pk).update(
+                deleted=F('deleted') + len(ids))
+        return len(ids)
+    PurgeJob.objects.filter(pk=job.pk).update(
+        status=PurgeJob.DONE, finished_at=timezone.now())
+    return 0
+
+
+def next_job():
+    return PurgeJob.objects.exclude(status=PurgeJob.DONE).order_by(
+        'id').first()
@@ -0,0 +1,215 @@
+import html
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from .models import Comment, Review, Title
+
+SEARCH_TABLE = 'reviews_search_index'
+# Тип документа кодируется в rowid индекса: rowid = id * KIND_STEP + тип,
+# так что обновление и удаление документа идут по первичному ключу.
+KINDS = {'title': 1, 'review': 2, 'comment': 3}
+KIND_STEP = 4
+# FTS5 отмечает совпадения этими символами, а не тегами: текст отзыва
+# экранируется целиком, и только потом отметки заменяются на <b>.
+MATCH_START, MATCH_END = '\x02', '\x03'
+
+
+def build_match(query):
+    """Превращает пользовательский запрос в выражение FTS5: каждое слово
+    ищется как префикс, все слова должны встретиться в документе."""
+    terms = [term.replace('"', '""') for term in query.split()]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def highlight(snippet):
+    """HTML фрагмента: текст экранирован, совпадения выделены <b>,
+    и каждый <b> закрыт, даже если отметки встретились в самом тексте."""
+    parts = html.escape(snippet).split(MATCH_START)
+    result = [parts[0].replace(MATCH_END, '')]
+    for part in parts[1:]:
+        match, _, rest = part.partition(MATCH_END)
+        result.append(f'<b>{match}</b>{rest.replace(MATCH_END, "")}')
+    return ''.join(result)
+
+
+def document(instance):
+    """Возвращает (тип, id, id произведения, id отзыва, текст)."""
+    if isinstance(instance, Title):
+        return ('title', instance.pk, instance.pk, None,
+                f'{instance.name}\n{instance.description or ""}')
+    if isinstance(instance, Review):
+        return ('review', instance.pk, instance.title_id, instance.pk,
+                instance.text)
+    if isinstance(instance, Comment):
+        return ('comment', instance.pk, instance.review.title_id,
+                instance.review_id, instance.text)
+    raise TypeError(f'{type(instance).__name__} is not searchable')
+
+
+class SearchResults:
+    """Ленивый список результатов поиска: Paginator берёт count() и срез,
+    и в БД уходят только COUNT и одна страница."""
+
+    def __init__(self, backend, match, kinds):
+        self.backend = backend
+        self.match = match
+        self.kinds = kinds
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = self.backend.count(self.match, self.kinds)
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self[item:item + 1][0]
+        start = item.start or 0
+        stop = self.count() if item.stop is None else item.stop
+        return self.backend.fetch(self.match, self.kinds,
+                                  start, max(stop - start, 0))
+
+
+class SQLiteFTSBackend:
+    """Инвертированный индекс на виртуальной таблице SQLite FTS5,
+    результаты ранжируются по bm25.
+    Миграция 0005 создаёт таблицу только на SQLite: на других СУБД
+    запись в индекс пропускается, а поиск ничего не находит."""
+
+    where = f'{SEARCH_TABLE} MATCH %s'
+
+    def __init__(self):
+        self._table_exists = False
+
+    def available(self):
+        if connection.vendor != 'sqlite':
+            return False
+        # Таблица не исчезает, так что найденную больше не проверяем.
+        if not self._table_exists:
+            self._table_exists = (
+                SEARCH_TABLE in connection.introspection.table_names())
+        return self._table_exists
+
+    def index(self, instance):
+        if not self.available():
+            return
+        kind, object_id, title_id, review_id, body = document(instance)
+        rowid = object_id * KIND_STEP + KINDS[kind]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [rowid])
+            cursor.execute(
+                f'INSERT INTO {SEARCH_TABLE} (rowid, kind, object_id, '
+                'title_id, review_id, body) VALUES (%s, %s, %s, %s, %s, %s)',
+                [rowid, kind, object_id, title_id, review_id, body])
+
+    def remove(self, instance):
+        if not self.available():
+            return
+        kind = document(instance)[0]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s',
+                [instance.pk * KIND_STEP + KINDS[kind]])
+
+    def remove_related(self, titles=None, reviews=None, comments=None):
+        """Убирает из индекса произведения из titles вместе с их отзывами
+        и комментариями, отзывы из reviews вместе с комментариями и
+        комментарии из comments. Выборки передаются в БД подзапросами,
+        так что id в память не загружаются."""
+        if not self.available():
+            return
+        conditions = []
+        if titles is not None:
+            conditions.append(('title_id', titles))
+        if reviews is not None:
+            conditions.append(('review_id', reviews))
+        with connection.cursor() as cursor:
+            for column, queryset in conditions:
+                sql, params = queryset.values('pk').query.sql_with_params()
+                cursor.execute(f'DELETE FROM {SEARCH_TABLE} '
+                               f'WHERE {column} IN ({sql})', params)
+            if comments is not None:
+                sql, params = comments.values('pk').query.sql_with_params()
+                cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE kind = %s '
+                               f'AND object_id IN ({sql})',
+                               ['comment', *params])
+
+    def rebuild(self):
+        """Заново строит индекс одним INSERT ... SELECT на каждую модель.
+        Скрытые мягким удалением записи в индекс не попадают."""
+        if not self.available():
+            return
+        title = Title._meta.db_table
+        review = Review._meta.db_table
+        comment = Comment._meta.db_table
+        visible = {
+            model: model.objects.visible().values('pk').query
+            .sql_with_params()
+            for model in (Title, Review, Comment)
+        }
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {SEARCH_TABLE} (rowid, kind, object_id, '
+                'title_id, review_id, body) '
+                f"SELECT id * {KIND_STEP} + {KINDS['title']}, 'title', id, "
+                "id, NULL, name || char(10) || coalesce(description, '') "
+                f'FROM {title} WHERE id IN ({visible[Title][0]})',
+                visible[Title][1])
+            cursor.execute(
+                f'INSERT INTO {SEARCH_TABLE} (rowid, kind, object_id, '
+                'title_id, review_id, body) '
+                f"SELECT id * {KIND_STEP} + {KINDS['review']}, 'review', id, "
+                f'title_id, id, text FROM {review} '
+                f'WHERE id IN ({visible[Review][0]})', visible[Review][1])
+            cursor.execute(
+                f'INSERT INTO {SEARCH_TABLE} (rowid, kind, object_id, '
+                'title_id, review_id, body) '
+                f"SELECT c.id * {KIND_STEP} + {KINDS['comment']}, 'comment', "
+                f'c.id, r.title_id, c.review_id, c.text FROM {comment} c '
+                f'JOIN {review} r ON r.id = c.review_id '
+                f'WHERE c.id IN ({visible[Comment][0]})', visible[Comment][1])
+
+    def search(self, query, kinds=None):
+        return SearchResults(self, build_match(query), kinds)
+
+    def _filter(self, match, kinds):
+        where, params = [self.where], [match]
+        if kinds:
+            where.append(f'kind IN ({", ".join(["%s"] * len(kinds))})')
+            params.extend(kinds)
+        return ' AND '.join(where), params
+
+    def count(self, match, kinds):
+        if not self.available():
+            return 0
+        where, params = self._filter(match, kinds)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {SEARCH_TABLE} WHERE {where}', params)
+            return cursor.fetchone()[0]
+
+    def fetch(self, match, kinds, offset, limit):
+        if not self.available():
+            return []
+        where, params = self._filter(match, kinds)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT kind, object_id, title_id, review_id, '
+                f"snippet({SEARCH_TABLE}, 4, %s, %s, '…', 16) "
+                f'FROM {SEARCH_TABLE} WHERE {where} '
+                'ORDER BY rank LIMIT %s OFFSET %s',
+                [MATCH_START, MATCH_END] + params + [limit, offset])
+            columns = ('type', 'id', 'title_id', 'review_id', 'snippet')
+            return [dict(zip(columns, (*row[:4], highlight(row[4]))))
+                    for row in cursor.fetchall()]
+
+
+search_backend = import_string(
+    getattr(settings, 'SEARCH_BACKEND', 'reviews.search.SQLiteFTSBackend'))()
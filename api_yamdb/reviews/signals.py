@@ -0,0 +1,100 @@
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+
+from .leaderboards import mark_dirty
+from .models import Comment, Review, Title
+from .search import search_backend
+from .utils import change_comment_count, change_title_rating
+
+
+@receiver(pre_save, sender=Review)
+def remember_previous_score(sender, instance, **kwargs):
+    instance._previous_rating = None
+    if instance.pk is not None:
+        instance._previous_rating = (
+            Review.objects.filter(pk=instance.pk)
+            .values_list('title_id', 'score').first()
+        )
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_rating', None)
+    if created or previous is None:
+        change_title_rating(instance.title_id, instance.score, 1)
+        return
+    previous_title_id, previous_score = previous
+    if previous_title_id == instance.title_id:
+        if previous_score != instance.score:
+            change_title_rating(instance.title_id,
+                                instance.score - previous_score, 0)
+        return
+    change_title_rating(previous_title_id, -previous_score, -1)
+    change_title_rating(instance.title_id, instance.score, 1)
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_delete(sender, instance, **kwargs):
+    change_title_rating(instance.title_id, -instance.score, -1)
+
+
+@receiver(pre_save, sender=Comment)
+def remember_previous_review(sender, instance, **kwargs):
+    instance._previous_review_id = None
+    if instance.pk is not None:
+        instance._previous_review_id = (
+            Comment.objects.filter(pk=instance.pk)
+            .values_list('review_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Comment)
+def update_comment_count_on_save(sender, instance, created, raw=False,
+                                 **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_review_id', None)
+    if created or previous is None:
+        change_comment_count(instance.review_id, 1)
+    elif previous != instance.review_id:
+        change_comment_count(previous, -1)
+        change_comment_count(instance.review_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def update_comment_count_on_delete(sender, instance, **kwargs):
+    change_comment_count(instance.review_id, -1)
+
+
+@receiver(post_save, sender=Title)
+@receiver(post_save, sender=Review)
+@receiver(post_save, sender=Comment)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    # Мягко удалённое произведение убирает из индекса soft_delete.
+    if not raw and getattr(instance, 'deleted_at', None) is None:
+        search_backend.index(instance)
+
+
+@receiver(post_delete, sender=Title)
+@receiver(post_delete, sender=Review)
+@receiver(post_delete, sender=Comment)
+def remove_from_search_index(sender, instance, **kwargs):
+    search_backend.remove(instance)
+
+
+@receiver([post_save, post_delete], sender=Review)
+def mark_leaderboards_on_review(sender, instance, raw=False, **kwargs):
+    if not raw:
+        mark_dirty(instance.title_id)
+
+
+@receiver([post_save, post_delete], sender=Title)
+@receiver(m2m_changed, sender=Title.genre.through)
+def mark_leaderboards_on_title(sender, raw=False, **kwargs):
+    # Произведение могло уйти из прежних категории и жанров,
+    # поэтому отмечаются все топы.
+    if not raw:
+        mark_dirty()
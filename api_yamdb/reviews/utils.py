@@ -0,0 +1,97 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Review, Title
+
+# Пока задано, сигналы не сдвигают счётчики: вызывающий код сам
+# пересчитывает их после изменений.
+_counters_paused = ContextVar('counters_paused', default=False)
+
+
+@contextmanager
+def counters_paused():
+    token = _counters_paused.set(True)
+    try:
+        yield
+    finally:
+        _counters_paused.reset(token)
+
+
+# Счётчики считаются без записей мягко удалённых пользователей.
+def _review_aggregate(aggregate):
+    return Coalesce(Subquery(
+        Review.objects.filter(title=OuterRef('pk'),
+                              author__deleted_at__isnull=True)
+        .order_by().values('title')
+        .annotate(value=aggregate).values('value')
+    ), 0)
+
+
+def change_title_rating(title_id, score_delta, count_delta):
+    """Атомарно сдвигает сохранённые сумму оценок и число отзывов."""
+    if _counters_paused.get():
+        return
+    Title.objects.filter(pk=title_id).update(
+        score_sum=F('score_sum') + score_delta,
+        review_count=F('review_count') + count_delta,
+    )
+
+
+def rebuild_title_ratings(title_ids=None):
+    """Пересчитывает сумму оценок и число отзывов по таблице отзывов."""
+    titles = Title.objects.all()
+    if title_ids is not None:
+        titles = titles.filter(pk__in=title_ids)
+    return titles.update(
+        score_sum=_review_aggregate(Sum('score')),
+        review_count=_review_aggregate(Count('pk')),
+    )
+
+
+def change_comment_count(review_id, delta):
+    """Атомарно сдвигает сохранённое число комментариев к отзыву."""
+    if _counters_paused.get():
+        return
+    Review.objects.filter(pk=review_id).update(
+        comment_count=F('comment_count') + delta)
+
+
+def _comment_count():
+    return Coalesce(Subquery(
+        Comment.objects.filter(review=OuterRef('pk'),
+                               author__deleted_at__isnull=True)
+        .order_by().values('review')
+        .annotate(value=Count('pk')).values('value')
+    ), 0)
+
+
+def rebuild_comment_counts(review_ids=None):
+    """Пересчитывает число комментариев к отзывам по таблице
+    комментариев."""
+    reviews = Review.objects.all()
+    if review_ids is not None:
+        reviews = reviews.filter(pk__in=review_ids)
+    return reviews.update(comment_count=_comment_count())
+
+
+def reviews_with_comment_count_drift():
+    """Возвращает отзывы, у которых сохранённое число комментариев
+    расходится с фактическим."""
+    return Review.objects.annotate(
+        actual_comment_count=_comment_count()
+    ).filter(~Q(comment_count=F('actual_comment_count')))
+
+
+def titles_with_rating_drift():
+    """Возвращает произведения, у которых сохранённый рейтинг расходится
+    с фактическими отзывами."""
+    return Title.objects.annotate(
+        actual_score_sum=_review_aggregate(Sum('score')),
+        actual_review_count=_review_aggregate(Count('pk')),
+    ).filter(
+        ~Q(score_sum=F('actual_score_sum'))
+        | ~Q(review_count=F('actual_review_count'))
+    )
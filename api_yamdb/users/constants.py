@@ -8,3 +8,12 @@ ROLES = (
 )
 
 USERNAME_PATTERN = r'^[\w.@+-]+$'
+
+EMAIL_PENDING = 'pending'
+EMAIL_SENT = 'sent'
+EMAIL_DEAD = 'dead'
+EMAIL_STATUSES = (
+    (EMAIL_PENDING, 'pending'),
+    (EMAIL_SENT, 'sent'),
+    (EMAIL_DEAD, 'dead'),
+)
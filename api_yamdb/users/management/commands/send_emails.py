@@ -0,0 +1,109 @@
+import time
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from users.constants import EMAIL_DEAD, EMAIL_PENDING, EMAIL_SENT
+from users.models import OutboxEmail
+
+DEFAULT_BATCH_SIZE = 100
+MAX_ATTEMPTS = 5
+# Задержка перед повторной попыткой: RETRY_DELAY * 2 ** (попытка - 1).
+RETRY_DELAY = timedelta(seconds=30)
+# На это время взятые письма откладываются: если отправитель упадёт,
+# они уйдут повторно после истечения аренды.
+LEASE = timedelta(minutes=10)
+
+
+def claim_batch(batch_size):
+    """Берёт в аренду письма, которым пора уйти, в короткой транзакции:
+    их следующая попытка сдвигается на LEASE вперёд. Отправка идёт уже
+    вне транзакции и не держит блокировку БД (на SQLite она общая для
+    всех запросов API). Обновление повторяет условие выборки, поэтому
+    два отправителя не берут одно письмо."""
+    now = timezone.now()
+    lease_until = now + LEASE
+    with transaction.atomic():
+        ids = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=EMAIL_PENDING, next_attempt_at__lte=now)
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        OutboxEmail.objects.filter(
+            pk__in=ids, status=EMAIL_PENDING, next_attempt_at__lte=now,
+        ).update(next_attempt_at=lease_until)
+    return list(OutboxEmail.objects.filter(
+        pk__in=ids, next_attempt_at=lease_until).order_by('id'))
+
+
+def send_batch(emails, connection):
+    """Отправляет пачку через одно открытое соединение и отмечает
+    результат каждого письма одним bulk_update в конце.
+    Возвращает (отправлено, с ошибкой)."""
+    now = timezone.now()
+    failed = 0
+    for email in emails:
+        message = EmailMessage(email.subject, email.body, email.from_email,
+                               [email.to_email], connection=connection)
+        email.attempts += 1
+        try:
+            # Соединение открывается один раз и переиспользуется.
+            connection.open()
+            message.send()
+        except Exception as error:
+            failed += 1
+            email.last_error = repr(error)
+            # После ошибки соединение может быть в неизвестном состоянии:
+            # следующее письмо откроет новое.
+            connection.close()
+            if email.attempts >= MAX_ATTEMPTS:
+                email.status = EMAIL_DEAD
+            else:
+                email.next_attempt_at = (
+                    now + RETRY_DELAY * 2 ** (email.attempts - 1))
+            continue
+        email.status = EMAIL_SENT
+        email.sent_at = now
+        email.last_error = ''
+    with transaction.atomic():
+        OutboxEmail.objects.bulk_update(
+            emails, ['status', 'attempts', 'next_attempt_at', 'last_error',
+                     'sent_at'])
+    return len(emails) - failed, failed
+
+
+class Command(BaseCommand):
+    help = "Sends queued emails from the outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Number of emails sent per batch',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5,
+            help='Seconds to wait when the outbox is empty',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit when there is nothing left to send',
+        )
+
+    def handle(self, *args, **options):
+        connection = get_connection()
+        try:
+            while True:
+                emails = claim_batch(options['batch_size'])
+                if emails:
+                    sent, failed = send_batch(emails, connection)
+                    self.stdout.write(f'Sent {sent}, failed {failed}')
+                    continue
+                if options['once']:
+                    return
+                connection.close()
+                time.sleep(options['interval'])
+        finally:
+            connection.close()
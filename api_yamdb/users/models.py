@@ -1,13 +1,18 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 
-from .constants import ROLES, ADMIN, MODER, USER
+from .constants import (ROLES, ADMIN, MODER, USER, EMAIL_STATUSES,
+                        EMAIL_PENDING)
 
 
 class User(AbstractUser):
     confirmation_code = models.CharField(max_length=32, editable=False)
     role = models.CharField(choices=ROLES, default='user', max_length=9)
     bio = models.TextField('Biography', blank=True)
+    # Время мягкого удаления: пользователь скрыт, а его отзывы и
+    # комментарии удаляет порциями команда purge_deleted.
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     @property
     def is_admin(self):
@@ -20,3 +25,29 @@ class User(AbstractUser):
     @property
     def is_user(self):
         return self.role == USER
+
+
+class OutboxEmail(models.Model):
+    """Письмо, ожидающее отправки командой send_emails."""
+
+    subject = models.CharField('Subject', max_length=255)
+    body = models.TextField('Body')
+    from_email = models.EmailField('From', max_length=254)
+    to_email = models.EmailField('To', max_length=254)
+    status = models.CharField(choices=EMAIL_STATUSES, default=EMAIL_PENDING,
+                              max_length=7)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'],
+                         name='outbox_status_next_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.to_email}: {self.subject} ({self.status})'
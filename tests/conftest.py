@@ -0,0 +1,32 @@
+import pytest
+
+from api.cache import LRUCacheBackend, response_cache
+from reviews.models import Category, Comment, Genre, Review, Title, User
+
+
+@pytest.fixture(autouse=True)
+def empty_response_cache():
+    # Ответ из кэша не делает запросов к БД и скрыл бы их от проверок.
+    response_cache.backend = LRUCacheBackend()
+
+
+@pytest.fixture
+def review(db):
+    category = Category.objects.create(name='Фильм', slug='movie')
+    genres = [Genre.objects.create(name=f'Жанр {i}', slug=f'genre{i}')
+              for i in range(3)]
+    authors = [User.objects.create(username=f'author{i}',
+                                   email=f'author{i}@example.com')
+               for i in range(3)]
+    for i in range(7):
+        title = Title.objects.create(
+            name=f'Произведение {i}', year=2000 + i, category=category,
+            description='Описание <b>с разметкой</b>')
+        title.genre.set(genres[:i % 3 + 1])
+        for author in authors:
+            review = Review.objects.create(
+                title=title, author=author, text='Текст', score=i % 10 + 1)
+            for comment_author in authors:
+                Comment.objects.create(
+                    review=review, author=comment_author, text='Ответ')
+    return review
@@ -0,0 +1,16 @@
+import pytest
+from rest_framework.renderers import JSONRenderer
+
+from reviews.management.commands.check_fast_serializers import SERIALIZERS
+
+
+@pytest.mark.parametrize('name', SERIALIZERS)
+def test_fast_serializer_matches_regular(review, name):
+    queryset, regular, fast = SERIALIZERS[name]
+    serializer = fast()
+    expected = regular(list(queryset()), many=True).data
+    actual = serializer.serialize(serializer.rows(queryset()))
+    assert expected, f'Нет данных для проверки {name}'
+    renderer = JSONRenderer()
+    assert renderer.render(actual) == renderer.render(expected), (
+        f'Быстрый сериализатор {name} отдаёт другой JSON')
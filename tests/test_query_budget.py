@@ -0,0 +1,13 @@
+import pytest
+
+from reviews.management.commands.check_query_budget import QUERY_BUDGETS
+
+
+@pytest.mark.parametrize('name', QUERY_BUDGETS)
+def test_query_budget(client, review, django_assert_max_num_queries, name):
+    url, budget = QUERY_BUDGETS[name]
+    url = url.format(title_id=review.title_id, review_id=review.pk)
+    with django_assert_max_num_queries(budget):
+        response = client.get(url)
+    assert response.status_code == 200, (
+        f'{url} вернул {response.status_code}')